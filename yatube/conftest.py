@@ -0,0 +1,9 @@
+import pytest
+
+from core.testing import isolated_cache
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_cache():
+    with isolated_cache():
+        yield
@@ -0,0 +1,132 @@
+"""Запуск WSGI-обработчика Django под ASGI-сервером.
+
+Django 2.2 не умеет ASGI, поэтому адаптер сам переводит HTTP-запрос ASGI в
+вызов WSGI. Тело запроса принимается и ответ отдаётся асинхронно, а поток
+из пула занят только на время работы представления: медленные клиенты
+не держат потоков. Потоковый ответ читается в одном потоке до конца,
+потому что его генератор может обращаться к базе.
+"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+
+BODY_MEMORY_SIZE = 1024 * 1024
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # Повторы Cookie склеиваются через '; ' (RFC 7540, 8.1.2.5),
+            # остальные заголовки - через запятую
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{environ[name]}{separator}{value}'
+        environ[name] = value
+    return environ
+
+
+class WSGIAdapter:
+    def __init__(self, application, threads):
+        self.application = application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Тип соединения {scope["type"]} не поддержан')
+        body = SpooledTemporaryFile(max_size=BODY_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(
+                self.executor, self.run, build_environ(scope, body), send, loop
+            )
+        finally:
+            body.close()
+        if response is not None:
+            start, content = response
+            await send(start)
+            await send({'type': 'http.response.body', 'body': content})
+        return None
+
+    def run(self, environ, send, loop):
+        """Выполняет запрос в потоке пула.
+
+        Обычный ответ возвращается целиком и отправляется уже из цикла
+        событий; потоковый отправляется отсюда по частям.
+        """
+        start = {'type': 'http.response.start'}
+
+        def start_response(status, headers, exc_info=None):
+            start['status'] = int(status.split(' ', 1)[0])
+            start['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ]
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = self.application(environ, start_response)
+        try:
+            if not getattr(result, 'streaming', False):
+                return start, b''.join(result)
+            emit(start)
+            for chunk in result:
+                if chunk:
+                    emit({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            emit({'type': 'http.response.body', 'body': b''})
+            return None
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
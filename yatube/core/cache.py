@@ -0,0 +1,262 @@
+"""Кэш в файле SQLite, общий для всех процессов узла.
+
+В отличие от LocMemCache записи видны всем воркерам сервера, поэтому
+сброс версии в одном процессе сразу действует в остальных. Целые числа
+хранятся как INTEGER, и incr() выполняется одним UPDATE в транзакции.
+Когда записей больше MAX_ENTRIES или их объём больше MAX_SIZE байт,
+вытесняются давно не читавшиеся записи (LRU).
+
+Чтение не ждёт блокировку записи: время обращения обновляется, только
+если оно старше TOUCH_INTERVAL секунд, а переполнение проверяется не при
+каждой записи, а при каждой CULL_EVERY-й записи процесса.
+"""
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB, expires REAL,'
+    ' accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def _marks(count):
+    return ','.join('?' * count)
+
+
+def _encode(value):
+    if type(value) is int:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 60))
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._writes = itertools.count(1)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=self._timeout, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode = WAL')
+        connection.execute('PRAGMA synchronous = NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _rows(self, connection, keys, now):
+        rows = connection.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({_marks(len(keys))}) AND {ALIVE}',
+            (*keys, now),
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed >= self._touch_interval
+        ]
+        if stale:
+            self._touch(connection, stale, now)
+        return {key: value for key, value, _ in rows}
+
+    def _touch(self, connection, keys, now):
+        """Обновляет время обращения, не дожидаясь чужой записи.
+
+        Вне транзакции блокировки у чтения нет, поэтому UPDATE идёт с
+        нулевым ожиданием: если базу держит другой писатель, порядок
+        вытеснения останется приблизительным.
+        """
+        waits = not connection.in_transaction
+        if waits:
+            connection.execute('PRAGMA busy_timeout = 0')
+        try:
+            connection.execute(
+                f'UPDATE cache SET accessed = ? '
+                f'WHERE key IN ({_marks(len(keys))})',
+                (now, *keys),
+            )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            if waits:
+                connection.execute(
+                    f'PRAGMA busy_timeout = {int(self._timeout * 1000)}'
+                )
+
+    def _cull(self, connection, now):
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )
+        count, size = connection.execute(
+            'SELECT count(*), total(size) FROM cache'
+        ).fetchone()
+        if count > self._max_entries:
+            excess = max(count - self._max_entries,
+                         count // self._cull_frequency)
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)', (excess,),
+            )
+        if size > self._max_size:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM ('
+                ' SELECT key, sum(size) OVER (ORDER BY accessed DESC)'
+                ' AS running FROM cache) WHERE running > ?)',
+                (self._max_size,),
+            )
+
+    def _store(self, connection, items, timeout, now):
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in items:
+            value, size = _encode(value)
+            rows.append((key, value, expires, now, size))
+        connection.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed, '
+            'size) VALUES (?, ?, ?, ?, ?)', rows,
+        )
+        if next(self._writes) % self._cull_every == 0:
+            self._cull(connection, now)
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        rows = self._rows(self._connection(), [key], time.time())
+        return _decode(rows[key]) if key in rows else default
+
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        if not names:
+            return {}
+        rows = self._rows(self._connection(), list(names), time.time())
+        return {names[key]: _decode(value) for key, value in rows.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            self._store(connection, [(key, value)], timeout, time.time())
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._key(key, version), value)
+                 for key, value in data.items()]
+        if items:
+            with self._transaction() as connection:
+                self._store(connection, items, timeout, time.time())
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            if self._rows(connection, [key], now):
+                return False
+            self._store(connection, [(key, value)], timeout, now)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            rows = self._rows(connection, [key], now)
+            if key not in rows:
+                raise ValueError(f"Key '{key}' not found")
+            if isinstance(rows[key], int):
+                connection.execute(
+                    'UPDATE cache SET value = value + ? WHERE key = ?',
+                    (delta, key),
+                )
+                return rows[key] + delta
+            value = _decode(rows[key]) + delta
+            encoded, size = _encode(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (encoded, size, key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            updated = connection.execute(
+                f'UPDATE cache SET expires = ?, accessed = ? '
+                f'WHERE key = ? AND {ALIVE}',
+                (self.get_backend_timeout(timeout), now, key, now),
+            ).rowcount
+        return bool(updated)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        deleted = self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (key,)
+        ).rowcount
+        return bool(deleted)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with self._transaction() as connection:
+            connection.executemany('DELETE FROM cache WHERE key = ?', keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке и переиспользуется между запросами.
+        pass
@@ -0,0 +1,44 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+
+from core.templatetags.user_filters import render_nav
+
+
+CASES = {
+    'гость': '{% load user_filters %}{% show_nav %}',
+    'пользователь': '{% load user_filters %}{% show_nav "leo" %}',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время тега show_nav с кэшем меню и без него для гостя '
+        'и вошедшего пользователя'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=2000)
+
+    def measure(self, source, number):
+        template = Template(source)
+        context = Context()
+        template.render(context)
+        return min(timeit.repeat(
+            lambda: template.render(context), number=number, repeat=3
+        )) / number * 1e6
+
+    def handle(self, *args, **options):
+        number = options['number']
+        for name, source in CASES.items():
+            cached = self.measure(source, number)
+            authenticated = name == 'пользователь'
+            rendered = min(timeit.repeat(
+                lambda: render_nav(authenticated), number=number, repeat=3
+            )) / number * 1e6
+            self.stdout.write(
+                f'{name}: без кэша {rendered:.1f} мкс, '
+                f'с кэшем {cached:.1f} мкс, '
+                f'в {rendered / cached:.0f} раз быстрее'
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.profiler import make_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает значение заголовка X-Profile, по которому запрос к '
+        'представлениям постов будет профилирован'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token())
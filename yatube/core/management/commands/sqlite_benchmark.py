@@ -0,0 +1,104 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_pragmas
+
+
+ROWS = 10000
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(
+        path, timeout=settings.SQLITE_BUSY_TIMEOUT, check_same_thread=False
+    )
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def run(path, pragmas, readers, writers, seconds):
+    """Нагружает файл базы параллельными чтениями и записями."""
+    setup = connect(path, pragmas)
+    with setup:
+        setup.execute(
+            'CREATE TABLE item (id INTEGER PRIMARY KEY, body TEXT NOT NULL)'
+        )
+        setup.executemany(
+            'INSERT INTO item (body) VALUES (?)',
+            (('x' * 200,) for _ in range(ROWS)),
+        )
+    setup.close()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(write):
+        connection = connect(path, pragmas)
+        done = locked = 0
+        while time.monotonic() < deadline:
+            try:
+                if write:
+                    with connection:
+                        connection.execute(
+                            'INSERT INTO item (body) VALUES (?)', ('y' * 200,)
+                        )
+                else:
+                    connection.execute(
+                        'SELECT id, body FROM item WHERE id > ? LIMIT 20',
+                        (random.randint(1, ROWS),),
+                    ).fetchall()
+                done += 1
+            except sqlite3.OperationalError:
+                locked += 1
+        connection.close()
+        with lock:
+            totals['writes' if write else 'reads'] += done
+            totals['locked'] += locked
+
+    threads = [
+        threading.Thread(target=worker, args=(write,))
+        for write in [False] * readers + [True] * writers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {name: count / seconds for name, count in totals.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при параллельных чтениях '
+        'и записях без настроек и с SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        profiles = (
+            ('по умолчанию', {}),
+            ('настроенный', settings.SQLITE_PRAGMAS),
+        )
+        for title, pragmas in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                result = run(
+                    os.path.join(directory, 'bench.sqlite3'),
+                    pragmas,
+                    options['readers'],
+                    options['writers'],
+                    options['seconds'],
+                )
+            self.stdout.write(
+                f'{title:>13}: чтений/с {result["reads"]:10.0f}  '
+                f'записей/с {result["writes"]:8.0f}  '
+                f'блокировок/с {result["locked"]:6.1f}'
+            )
@@ -0,0 +1,74 @@
+import os
+import posixpath
+import re
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# С таким заголовком Google Fonts отдаёт шрифты в формате woff2.
+USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/100.0 Safari/537.36'
+)
+FONT_URL = re.compile(r'url\((https://[^)]+)\)')
+
+
+def fetch(url):
+    request = Request(url, headers={'User-Agent': USER_AGENT})
+    with urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def write(path, content):
+    with open(path, 'wb') as file:
+        file.write(content)
+
+
+def localize_fonts(css, fetch=fetch):
+    """Заменяет адреса шрифтов в CSS локальными; возвращает CSS и файлы.
+
+    Файлы кладутся рядом с CSS, поэтому ссылки на них относительные.
+    """
+    files = {}
+
+    def replace(match):
+        url = match.group(1)
+        name = posixpath.basename(urlparse(url).path)
+        if name not in files:
+            files[name] = fetch(url)
+        return f'url({name})'
+    return FONT_URL.sub(replace, css), files
+
+
+class Command(BaseCommand):
+    help = (
+        'Скачивает шрифты, иконки и скрипты из VENDOR_ASSETS в static/, '
+        'чтобы страницы не обращались к сторонним CDN'
+    )
+
+    def handle(self, *args, **options):
+        root = settings.STATICFILES_DIRS[0]
+        for name, url in settings.VENDOR_ASSETS.items():
+            path = os.path.join(root, *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                content = fetch(url)
+                files = {}
+                if name.endswith('.css'):
+                    css, files = localize_fonts(content.decode())
+                    content = css.encode()
+            except OSError as error:
+                raise CommandError(f'{url}: {error}')
+            directory = os.path.dirname(path)
+            for file_name, data in files.items():
+                write(os.path.join(directory, file_name), data)
+            write(path, content)
+            self.stdout.write(
+                f'{name}: {len(content)} байт, файлов шрифтов {len(files)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Готово; добавьте static/vendor в репозиторий'
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.templates import warm
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны проекта и печатает время разбора каждого, '
+        'начиная с самых медленных'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        parsed = warm()
+        for name, elapsed in sorted(parsed, key=lambda item: -item[1]):
+            self.stdout.write(f'{elapsed * 1000:8.2f} мс  {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Шаблонов: {len(parsed)}, '
+            f'{(time.perf_counter() - started) * 1000:.1f} мс'
+        ))
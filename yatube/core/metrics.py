@@ -0,0 +1,168 @@
+"""Замеры производительности каждого запроса.
+
+PerformanceMiddleware считает SQL-запросы и их время, время отрисовки
+шаблонов, попадания и промахи кэша и общее время ответа. Замеры уходят в
+заголовок Server-Timing и в журнал core.metrics одной JSON-строкой, а
+последние PERF_SAMPLES ответов каждого URL хранятся в памяти процесса для
+перцентилей на странице admin/performance/.
+"""
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = '<unresolved>'
+PERCENTILES = (50, 95, 99)
+
+_state = threading.local()
+
+
+class Metrics:
+    """Замеры одного запроса; время хранится в секундах."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+
+def current():
+    return getattr(_state, 'metrics', None)
+
+
+def count_cache(hits, misses):
+    """Учитывает результат чтения из кэша в замерах текущего запроса."""
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+@contextmanager
+def template_timer():
+    """Время отрисовки; вложенные шаблоны не считаются дважды."""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    metrics.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth -= 1
+        if not metrics.depth:
+            metrics.template += time.perf_counter() - started
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(rank / 100 * len(ordered)) - 1, 0)]
+
+
+class Samples:
+    """Последние замеры по имени URL, общие для потоков процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(
+            lambda: deque(maxlen=settings.PERF_SAMPLES)
+        )
+
+    def add(self, name, total, queries):
+        with self.lock:
+            self.samples[name].append((total, queries))
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+    def summary(self):
+        with self.lock:
+            samples = {name: list(rows) for name, rows in self.samples.items()}
+        result = {}
+        for name, rows in sorted(samples.items()):
+            totals = [total for total, _ in rows]
+            queries = [count for _, count in rows]
+            result[name] = {'requests': len(rows)}
+            for rank in PERCENTILES:
+                result[name][f'p{rank}_ms'] = round(
+                    percentile(totals, rank), 2
+                )
+            result[name]['p95_queries'] = percentile(queries, 95)
+        return result
+
+
+samples = Samples()
+
+
+def server_timing(metrics, total):
+    return ', '.join([
+        f'db;dur={metrics.sql * 1000:.1f};desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template * 1000:.1f}',
+        'cache;desc="{} hits, {} misses"'.format(
+            metrics.cache_hits, metrics.cache_misses
+        ),
+        f'total;dur={total:.1f}',
+    ])
+
+
+class PerformanceMiddleware:
+    """Стоит в начале MIDDLEWARE, чтобы мерить весь ответ целиком."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERF_METRICS:
+            return self.get_response(request)
+        metrics = _state.metrics = Metrics()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _state.metrics = None
+        total = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        name = match.view_name if match else UNRESOLVED
+        samples.add(name, total, metrics.queries)
+        response['Server-Timing'] = server_timing(metrics, total)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': name,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'sql_ms': round(metrics.sql * 1000, 2),
+            'queries': metrics.queries,
+            'template_ms': round(metrics.template * 1000, 2),
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }, ensure_ascii=False))
+        return response
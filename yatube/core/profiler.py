@@ -0,0 +1,133 @@
+"""Выборочное профилирование запросов к представлениям постов.
+
+Профилируется доля PROFILE_SAMPLE_RATE запросов к пространствам имён из
+PROFILE_NAMESPACES и любой такой запрос с подписанным заголовком
+X-Profile (значение выдаёт команда profile_token). Пока идёт запрос,
+отдельный поток каждые PROFILE_INTERVAL секунд снимает стек потока
+запроса. Стеки сохраняются в PROFILE_DIR в свёрнутом формате
+flamegraph.pl и speedscope: «корень;...;лист число». Когда профилирование
+не запрошено, middleware делает одну проверку заголовка и random().
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+SALT = 'core.profiler'
+TOKEN = 'profile'
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SALT).sign(TOKEN)
+
+
+def valid_token(value) -> bool:
+    try:
+        return signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=settings.PROFILE_TOKEN_AGE
+        ) == TOKEN
+    except signing.BadSignature:
+        return False
+
+
+def frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{module}.{name}:{frame.f_lineno}'
+
+
+def fold(frame):
+    """Стек кадра от корня к листу через точку с запятой."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """Снимает стеки потока thread_id, пока не вызван stop()."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name='profiler', daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self.stacks
+
+    def write(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.profiler = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.profiler is not None:
+                request.profiler.stop()
+        if request.profiler is not None:
+            path = self.save(request)
+            response['X-Profile'] = os.path.basename(path)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        namespace = request.resolver_match.namespace
+        if namespace not in settings.PROFILE_NAMESPACES:
+            return None
+        header = request.META.get(HEADER)
+        if header is not None:
+            wanted = valid_token(header)
+        else:
+            wanted = random.random() < settings.PROFILE_SAMPLE_RATE
+        if wanted:
+            request.profiler = Sampler(
+                threading.get_ident(), settings.PROFILE_INTERVAL
+            ).start()
+        return None
+
+    def save(self, request):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = '{}-{}-{}.folded'.format(
+            request.resolver_match.view_name.replace(':', '-'),
+            time.strftime('%Y%m%d-%H%M%S'),
+            time.perf_counter_ns(),
+        )
+        path = os.path.join(settings.PROFILE_DIR, name)
+        request.profiler.write(path)
+        logger.info('Профиль %s: %s', request.path, path)
+        return path
@@ -0,0 +1,112 @@
+"""Чтение с реплик базы данных и запись в основную базу.
+
+Представления, помеченные @replica_reads, на GET-запросах читают с
+реплик. Запрос, который что-то записал в базу, закрепляет сессию за
+основной базой на REPLICA_STICKY_SECONDS: пользователь сразу видит свои
+изменения, даже если реплики ещё не догнали основную базу.
+
+Реплики отстают не больше чем на REPLICA_STICKY_SECONDS. Промахи кэша
+страниц и карточек, изменённых позже, читаются внутри primary_reads() из
+основной базы: иначе отставшая реплика закрепила бы старые строки в кэше
+под новой версией.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+PRIMARY = 'default'
+STICKY_KEY = '_primary_until'
+PRIMARY_APPS = ('sessions',)
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+def replica_reads(view):
+    """Разрешает представлению читать с реплик."""
+    view.replica_reads = True
+    return view
+
+
+def reading_from_replicas() -> bool:
+    return getattr(_state, 'replicas', False)
+
+
+def replicas_caught_up(modified) -> bool:
+    """Реплики уже получили изменения, сделанные в момент modified."""
+    return time.time() - modified >= settings.REPLICA_STICKY_SECONDS
+
+
+@contextmanager
+def primary_reads():
+    """Внутри блока все чтения идут в основную базу."""
+    replicas = reading_from_replicas()
+    _state.replicas = False
+    try:
+        yield
+    finally:
+        _state.replicas = replicas
+
+
+class ReplicaRouter:
+    def __init__(self, replicas=None):
+        self.replicas = replica_aliases() if replicas is None else replicas
+
+    def db_for_read(self, model, **hints):
+        if (
+            self.replicas
+            and reading_from_replicas()
+            and model._meta.app_label not in PRIMARY_APPS
+        ):
+            return random.choice(self.replicas)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY
+
+
+class ReplicaMiddleware:
+    """Включает реплики для помеченных представлений и закрепляет сессию
+    за основной базой после записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replicas = False
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replicas = False
+        if _state.wrote and replica_aliases() and hasattr(request, 'session'):
+            request.session[STICKY_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        pinned = hasattr(request, 'session') and (
+            request.session.get(STICKY_KEY, 0) > time.time()
+        )
+        _state.replicas = (
+            bool(replica_aliases())
+            and getattr(view_func, 'replica_reads', False)
+            and request.method in SAFE_METHODS
+            and not pinned
+        )
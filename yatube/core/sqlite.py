@@ -0,0 +1,50 @@
+"""Профиль производительности SQLite.
+
+При SQLITE_TUNING каждое новое соединение включает WAL, synchronous=NORMAL
+и mmap из SQLITE_PRAGMAS, а запрос вне транзакции, упавший с «database is
+locked» после busy timeout, повторяется до SQLITE_LOCKED_RETRIES раз.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db.utils import OperationalError
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 0.05
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def retry_locked(execute, sql, params, many, context):
+    attempt = 0
+    while True:
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            # Внутри транзакции повтор одного запроса ничего не спасёт:
+            # откатывать и повторять её должен вызывающий код.
+            if (
+                'database is locked' not in str(error)
+                or context['connection'].in_atomic_block
+                or attempt >= settings.SQLITE_LOCKED_RETRIES
+            ):
+                raise
+            attempt += 1
+            logger.warning('База занята, повтор %s: %s', attempt, sql)
+            time.sleep(RETRY_DELAY * 2 ** attempt)
+
+
+def tune_connection(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+    if retry_locked not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_locked)
@@ -0,0 +1,283 @@
+"""Сборка и раздача статики.
+
+При STATIC_PIPELINE collectstatic собирает файлы из BUNDLES в сжатые
+пачки, даёт всем файлам имена с хэшем содержимого и кладёт рядом копии
+.gz и .br. StaticFilesMiddleware отдаёт их из STATIC_ROOT: сжатую копию,
+если клиент её принимает, а файлы с хэшем в имени - с заголовками
+вечного кэширования. Если локальных копий VENDOR_ASSETS нет, сборка
+предупреждает об этом, а страницы берут файлы с CDN.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage
+)
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.templatetags.static import static
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.ico')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+STRINGS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+CSS_COMMENTS = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACES = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    """Убирает комментарии и лишние пробелы вне строк."""
+    parts = STRINGS.split(CSS_COMMENTS.sub('', css))
+    for index in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[index])
+        part = CSS_SPACES.sub(r'\1', part)
+        parts[index] = part.replace(': ', ':').replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+# После этих знаков и слов "/" начинает регулярное выражение, а не деление
+REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else',
+}
+LAST_WORD = re.compile(r'([A-Za-z_$][\w$]*)\s*$')
+
+
+def _literal_end(js, start, quote):
+    """Конец строки, шаблона или регулярного выражения, начатых в start."""
+    index, in_class = start + 1, False
+    while index < len(js):
+        char = js[index]
+        if char == '\\':
+            index += 2
+            continue
+        if quote == '/':
+            if char == '[':
+                in_class = True
+            elif char == ']':
+                in_class = False
+            elif char == '/' and not in_class:
+                index += 1
+                while index < len(js) and js[index].isalpha():
+                    index += 1
+                return index
+        elif char == quote:
+            return index + 1
+        if char == '\n' and quote != '`':
+            return index
+        index += 1
+    return index
+
+
+def _regex_allowed(code):
+    code = code.rstrip()
+    if not code or code[-1] in REGEX_AFTER:
+        return True
+    word = LAST_WORD.search(code)
+    return bool(word) and word.group(1) in REGEX_KEYWORDS
+
+
+def js_parts(js):
+    """Делит JavaScript на пары (код ли это, текст).
+
+    Строки, шаблоны и регулярные выражения идут отдельными частями без
+    изменений, комментарии выброшены (кроме /*! ... */).
+    """
+    parts, code, index = [], [], 0
+    # Перед "/" после литерала стоит значение: это деление
+    after_literal = False
+    while index < len(js):
+        char, pair = js[index], js[index:index + 2]
+        if pair == '//':
+            end = js.find('\n', index)
+            index = len(js) if end == -1 else end
+            continue
+        if pair == '/*':
+            end = js.find('*/', index + 2)
+            end = len(js) if end == -1 else end + 2
+            if js.startswith('/*!', index):
+                parts += [(True, ''.join(code)), (False, js[index:end])]
+                code = []
+            else:
+                code.append(' ')
+            index = end
+            continue
+        preceding = ''.join(code)
+        if char in '\'"`' or char == '/' and (
+            _regex_allowed(preceding)
+            and not (after_literal and not preceding.strip())
+        ):
+            end = _literal_end(js, index, char)
+            parts += [(True, preceding), (False, js[index:end])]
+            code, index, after_literal = [], end, True
+            continue
+        code.append(char)
+        index += 1
+    parts.append((True, ''.join(code)))
+    return parts
+
+
+def minify_js(js):
+    """Убирает комментарии, отступы и лишние пробелы вне литералов.
+
+    Переводы строк остаются: от них зависит автоматическая расстановка
+    точек с запятой. Строки, шаблоны и регулярные выражения не меняются.
+    """
+    result = []
+    for is_code, text in js_parts(js):
+        if is_code:
+            text = re.sub(r'[ \t]*\n\s*', '\n', text)
+            text = re.sub(r'[ \t]+', ' ', text)
+        result.append(text)
+    return ''.join(result).strip()
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def compress(content):
+    """Сжатые копии файла: {расширение: байты}, только если они меньше."""
+    variants = {'.gz': gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return {
+        extension: data for extension, data in variants.items()
+        if len(data) < len(content)
+    }
+
+
+class PipelineStorage(ManifestStaticFilesStorage):
+    """Хранилище collectstatic: пачки, имена с хэшем и сжатые копии."""
+
+    def build_bundles(self, paths):
+        for bundle, sources in settings.BUNDLES.items():
+            minify = MINIFIERS[os.path.splitext(bundle)[1]]
+            content = '\n'.join(
+                minify(self.open(source).read().decode())
+                for source in sources
+            )
+            if self.exists(bundle):
+                self.delete(bundle)
+            self.save(bundle, ContentFile(content.encode()))
+            paths[bundle] = (self, bundle)
+
+    def compress_file(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as file:
+            content = file.read()
+        for extension, data in compress(content).items():
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self.save(name + extension, ContentFile(data))
+
+    def check_vendored(self, paths):
+        missing = sorted(set(settings.VENDOR_ASSETS) - set(paths))
+        if missing:
+            logger.warning(
+                'Нет локальных копий внешних файлов, страницы возьмут их '
+                'с CDN: %s. Скачайте их командой manage.py vendor_assets.',
+                ', '.join(missing),
+            )
+
+    def post_process(self, paths, dry_run=False, **options):
+        self.check_vendored(paths)
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        self.build_bundles(paths)
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not isinstance(processed, Exception):
+                names.update((name, hashed_name or name))
+            yield name, hashed_name, processed
+        for name in sorted(names):
+            self.compress_file(name)
+
+
+def bundle_urls(bundle):
+    """Адрес пачки или, без STATIC_PIPELINE, адреса её исходников."""
+    if settings.STATIC_PIPELINE:
+        return [static(bundle)]
+    return [static(source) for source in settings.BUNDLES[bundle]]
+
+
+@lru_cache(maxsize=None)
+def vendored(name) -> bool:
+    return finders.find(name) is not None
+
+
+def vendor_url(name):
+    """Локальная копия внешнего файла, пока её нет - исходный адрес."""
+    if vendored(name):
+        return static(name)
+    return settings.VENDOR_ASSETS[name]
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT при STATIC_PIPELINE."""
+
+    def __init__(self, get_response):
+        if not settings.STATIC_PIPELINE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.root = os.path.realpath(settings.STATIC_ROOT)
+        self.hashed = set(
+            getattr(staticfiles_storage, 'hashed_files', {}).values()
+        )
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path.startswith(
+            settings.STATIC_URL
+        ):
+            response = self.serve(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request):
+        name = posixpath.normpath(request.path[len(settings.STATIC_URL):])
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(
+            path
+        ):
+            return None
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        encoding, served = None, path
+        for extension, candidate in (('.br', 'br'), ('.gz', 'gzip')):
+            if candidate in accepted and os.path.isfile(path + extension):
+                encoding, served = candidate, path + extension
+                break
+        content_type = mimetypes.guess_type(path)[0]
+        response = FileResponse(
+            open(served, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        if name in self.hashed:
+            response['Cache-Control'] = IMMUTABLE
+        else:
+            response['Cache-Control'] = (
+                f'public, max-age={settings.STATIC_MAX_AGE}'
+            )
+        return response
@@ -0,0 +1,155 @@
+"""Шаблонизатор Django с замерами разбора и отрисовки шаблонов.
+
+Время отрисовки попадает в замеры запроса core.metrics, а время разбора
+и отрисовки каждого шаблона копится в timings. warm() заранее разбирает
+все шаблоны из TEMPLATES['DIRS'] и заполняет таблицы URL для тега url: с
+кэширующим загрузчиком (TEMPLATE_CACHE) первые запросы после запуска
+процесса не тратят время на разбор и импорт.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.template import engines, TemplateDoesNotExist
+from django.template.backends import django as backend
+from django.urls import (
+    get_resolver, NoReverseMatch, reverse, set_urlconf
+)
+from django.utils import translation
+
+from .metrics import template_timer
+
+
+logger = logging.getLogger(__name__)
+
+STRING = '<string>'
+
+
+class Timings:
+    """Время разбора и отрисовки по именам шаблонов в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parse = {}
+        self.render = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def parsed(self, name, elapsed):
+        with self.lock:
+            self.parse.setdefault(name, elapsed)
+
+    def rendered(self, name, elapsed):
+        with self.lock:
+            stats = self.render[name]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+    def clear(self):
+        with self.lock:
+            self.parse.clear()
+            self.render.clear()
+
+    def summary(self):
+        with self.lock:
+            names = sorted(self.parse.keys() | self.render.keys())
+            result = {}
+            for name in names:
+                renders, total, slowest = self.render.get(name, (0, 0, 0))
+                result[name] = {
+                    'parse_ms': round(self.parse.get(name, 0) * 1000, 2),
+                    'renders': renders,
+                    'render_avg_ms': round(
+                        total / renders * 1000 if renders else 0, 2
+                    ),
+                    'render_max_ms': round(slowest * 1000, 2),
+                }
+        return result
+
+
+timings = Timings()
+
+
+class Template(backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            with template_timer():
+                return super().render(context, request)
+        finally:
+            timings.rendered(
+                self.origin.template_name or STRING,
+                time.perf_counter() - started,
+            )
+
+
+class DjangoTemplates(backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        started = time.perf_counter()
+        try:
+            template = self.engine.get_template(template_name)
+        except TemplateDoesNotExist as exc:
+            backend.reraise(exc, self)
+        # С кэширующим загрузчиком первый вызов - это и есть разбор.
+        timings.parsed(template_name, time.perf_counter() - started)
+        return Template(template, self)
+
+
+def template_names(directories):
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.endswith('.html'):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, directory).replace(
+                        os.sep, '/'
+                    )
+
+
+def populate_urls():
+    """Заранее строит таблицы reverse() всех пространств имён URL.
+
+    reverse() строит их при первом обращении к пространству имён и
+    отдельно для каждого языка, поэтому здесь по одному адресу каждого
+    пространства обращается с LANGUAGE_CODE, как запросы.
+    """
+    # Обработчик запросов ставит ROOT_URLCONF явно, а get_resolver()
+    # кэширует таблицы по значению аргумента.
+    set_urlconf(settings.ROOT_URLCONF)
+    resolver = get_resolver(settings.ROOT_URLCONF)
+    try:
+        with translation.override(settings.LANGUAGE_CODE):
+            for namespace, (_, child) in resolver.namespace_dict.items():
+                for name in child.reverse_dict:
+                    if not isinstance(name, str):
+                        continue
+                    try:
+                        reverse(f'{namespace}:{name}')
+                    except NoReverseMatch:
+                        continue
+                    break
+    finally:
+        set_urlconf(None)
+
+
+def warm():
+    """Разбирает все шаблоны из DIRS; возвращает [(имя, секунды)]."""
+    populate_urls()
+    result = []
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in template_names(engine.dirs):
+            started = time.perf_counter()
+            try:
+                engine.get_template(name)
+            except Exception:
+                logger.exception('Шаблон %s не разобран', name)
+                continue
+            result.append((name, time.perf_counter() - started))
+    return result
@@ -0,0 +1,16 @@
+from django import template
+
+from core import staticfiles
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle_urls(bundle):
+    return staticfiles.bundle_urls(bundle)
+
+
+@register.simple_tag
+def vendor_url(name):
+    return staticfiles.vendor_url(name)
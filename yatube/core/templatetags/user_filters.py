@@ -1,36 +1,73 @@
+from functools import lru_cache
+
 from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import get_script_prefix, reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 
 
 register = template.Library()
 
+NAV_TEMPLATE = 'includes/nav.html'
+# Метки не могут встретиться в имени пользователя: в нём нет фигурных скобок.
+USERNAME_MARK = '{username}'
+PROFILE_URL_MARK = '{profile_url}'
+
+MENU = (
+    {'title': 'Об авторе', 'url_name': 'about:author'},
+    {'title': 'Технологии', 'url_name': 'about:tech'},
+    {'title': 'Поиск', 'url_name': 'posts:search'},
+)
+USER_MENU = MENU + (
+    {'title': 'Новая запись', 'url_name': 'posts:post_create'},
+    {'title': 'Изменить пароль', 'url_name': 'users:password_change'},
+    {'title': 'Выйти', 'url_name': 'users:logout'},
+    {'title': 'Пользователь', 'url_name': 'posts:profile'},
+)
+GUEST_MENU = MENU + (
+    {'title': 'Войти', 'url_name': 'users:login'},
+    {'title': 'Регистрация', 'url_name': 'users:signup'},
+)
+
 
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
 
 
-@register.inclusion_tag('includes/nav.html')
-def show_nav(username=None) -> list:
-    menu = [
-        {'title': 'Об авторе', 'url_name': 'about:author'},
-        {'title': 'Технологии', 'url_name': 'about:tech'},
-        {'title': 'Новая запись', 'url_name': 'posts:post_create'},
-        {'title': 'Изменить пароль', 'url_name': 'users:password_change'},
-        {'title': 'Выйти', 'url_name': 'users:logout'},
-        {'title': 'Пользователь', 'url_name': 'posts:profile'},
-        {'title': 'Войти', 'url_name': 'users:login'},
-        {'title': 'Регистрация', 'url_name': 'users:signup'},
-    ]
-    if username is not None:
-        username = username
-        del (
-            menu[7],
-            menu[6]
-        )
-        m = {'menu': menu, 'username': username}
-        return m
+def render_nav(authenticated) -> str:
+    """Меню с метками вместо имени пользователя и адреса его профиля."""
+    if not authenticated:
+        return render_to_string(NAV_TEMPLATE, {'menu': GUEST_MENU})
+    return render_to_string(NAV_TEMPLATE, {
+        'menu': USER_MENU,
+        'username': USERNAME_MARK,
+        'profile_url': PROFILE_URL_MARK,
+    })
+
+
+@lru_cache(maxsize=None)
+def cached_nav(authenticated, script_prefix) -> str:
+    """Меню отрисовывается один раз на процесс для каждого состояния.
+
+    Адреса в меню зависят от префикса скрипта, поэтому он входит в ключ.
+    """
+    return render_nav(authenticated)
+
+
+@register.simple_tag
+def show_nav(username=None):
+    authenticated = username is not None
+    if settings.DEBUG:
+        # При разработке правки nav.html видны без перезапуска.
+        html = render_nav(authenticated)
     else:
-        for x in range(4):
-            del menu[2]
-        m = {'menu': menu}
-        return m
+        html = cached_nav(authenticated, get_script_prefix())
+    if authenticated:
+        html = html.replace(
+            PROFILE_URL_MARK,
+            escape(reverse('posts:profile', args=(username,))),
+        ).replace(USERNAME_MARK, escape(username))
+    return mark_safe(html)
@@ -0,0 +1,28 @@
+"""Окружение тестов: кэш в памяти процесса вместо общего файла SQLite.
+
+manage.py test берёт его из TestRunner, pytest - из фикстуры в
+conftest.py; запущенный сервер и тесты не видят кэш друг друга.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+
+def isolated_cache():
+    return override_settings(CACHES=TEST_CACHES)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_override = isolated_cache()
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,648 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.db.utils import OperationalError
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import Client, override_settings, RequestFactory, TestCase
+from django.urls import reverse
+
+from core import (
+    metrics, profiler, routers, sqlite, staticfiles, templates
+)
+from core.asgi import build_environ, WSGIAdapter
+from core.cache import SQLiteCache
+from core.management.commands.vendor_assets import localize_fonts
+from core.templatetags import user_filters
+from posts import caching
+from posts.models import Post, User
+from yatube import asgi
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.router = routers.ReplicaRouter(replicas=['replica1'])
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='author')
+        self.seen = []
+
+        def read_view(request):
+            self.seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        @routers.replica_reads
+        def replica_view(request):
+            return read_view(request)
+
+        def write_view(request):
+            Post.objects.create(author=self.user, text='Пост')
+            return HttpResponse()
+
+        self.read_view = read_view
+        self.replica_view = replica_view
+        self.write_view = write_view
+
+    def run_view(self, view, method='get', session=None):
+        request = getattr(self.factory, method)('/')
+        SessionMiddleware().process_request(request)
+        if session:
+            request.session.update(session)
+        middleware = routers.ReplicaMiddleware(
+            lambda request: middleware.process_view(request, view, (), {})
+            or view(request)
+        )
+        with mock.patch.object(
+            routers, 'replica_aliases', return_value=['replica1']
+        ):
+            middleware(request)
+        return request
+
+    def test_reads_use_replica_only_in_marked_views(self):
+        """С реплик читают только помеченные представления"""
+        self.run_view(self.read_view)
+        self.run_view(self.replica_view)
+        self.assertEqual(self.seen, ['default', 'replica1'])
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_primary_reads_inside_replica_view(self):
+        """Внутри primary_reads() помеченное представление читает основную"""
+        @routers.replica_reads
+        def cache_filling_view(request):
+            with routers.primary_reads():
+                self.seen.append(self.router.db_for_read(Post))
+            return read_view(request)
+
+        read_view = self.read_view
+        self.run_view(cache_filling_view)
+        self.assertEqual(self.seen, ['default', 'replica1'])
+
+    def test_cached_page_miss_reads_replica_once_caught_up(self):
+        """Промах кэша страницы читает реплику, если та уже догнала правку"""
+        @caching.cached_page('test')
+        def page(request):
+            return read_view(request)
+
+        @routers.replica_reads
+        def view(request):
+            request.user = AnonymousUser()
+            return page(request)
+
+        read_view = self.read_view
+        cache.clear()
+        cache.set(
+            caching.modified_key('test_page', 'test'),
+            time.time() - settings.REPLICA_STICKY_SECONDS,
+        )
+        self.run_view(view)
+        caching.bump_version('test_page', 'test')
+        self.run_view(view)
+        self.assertEqual(self.seen, ['replica1', 'default'])
+
+    def test_writes_and_sessions_use_primary(self):
+        """Запись и сессии всегда идут в основную базу"""
+        with mock.patch.object(
+            routers, 'reading_from_replicas', return_value=True
+        ):
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'replica1')
+
+    def test_session_sticks_to_primary_after_write(self):
+        """После записи сессия читает из основной базы"""
+        request = self.run_view(self.write_view, method='post')
+        pinned = request.session[routers.STICKY_KEY]
+        self.assertGreater(pinned, time.time())
+        self.run_view(
+            self.replica_view,
+            session={routers.STICKY_KEY: pinned},
+        )
+        self.run_view(
+            self.replica_view,
+            session={routers.STICKY_KEY: time.time() - 1},
+        )
+        self.assertEqual(self.seen, ['default', 'replica1'])
+
+
+@override_settings(SQLITE_LOCKED_RETRIES=2)
+@mock.patch.object(sqlite.time, 'sleep')
+class SQLiteTuningTests(TestCase):
+    def locked_execute(self, failures):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+            return 'ok'
+        return execute, calls
+
+    def context(self, in_atomic_block=False):
+        return {'connection': mock.Mock(in_atomic_block=in_atomic_block)}
+
+    def test_locked_query_retried(self, sleep):
+        """Запрос, упавший на блокировке базы, повторяется"""
+        execute, calls = self.locked_execute(failures=2)
+        with self.assertLogs('core.sqlite', 'WARNING'):
+            result = sqlite.retry_locked(
+                execute, 'SELECT 1', (), False, self.context()
+            )
+        self.assertEqual(result, 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_retries_are_limited(self, sleep):
+        """Число повторов ограничено SQLITE_LOCKED_RETRIES"""
+        execute, calls = self.locked_execute(failures=5)
+        with self.assertLogs('core.sqlite', 'WARNING'):
+            with self.assertRaises(OperationalError):
+                sqlite.retry_locked(
+                    execute, 'SELECT 1', (), False, self.context()
+                )
+        self.assertEqual(len(calls), 3)
+
+    def test_no_retry_inside_transaction(self, sleep):
+        """Внутри транзакции запрос не повторяется"""
+        execute, calls = self.locked_execute(failures=1)
+        with self.assertRaises(OperationalError):
+            sqlite.retry_locked(
+                execute, 'SELECT 1', (), False, self.context(True)
+            )
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(SQLITE_TUNING=True)
+    def test_pragmas_applied_to_new_connections(self, sleep):
+        """Новое соединение получает PRAGMA и повтор при блокировке"""
+        connection = mock.MagicMock(vendor='sqlite', execute_wrappers=[])
+        cursor = connection.cursor.return_value.__enter__.return_value
+        sqlite.tune_connection(None, connection)
+        sqlite.tune_connection(None, connection)
+        cursor.execute.assert_any_call('PRAGMA journal_mode = WAL')
+        cursor.execute.assert_any_call('PRAGMA synchronous = NORMAL')
+        self.assertEqual(connection.execute_wrappers, [sqlite.retry_locked])
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_tests_use_memory_cache(self):
+        """Тесты работают с кэшем в памяти, а не с файлом сервера"""
+        self.assertIsInstance(caches['default'], LocMemCache)
+
+    def test_values_shared_between_instances(self):
+        """Запись одного экземпляра видна другому"""
+        self.cache.set('post', {'text': 'Пост'})
+        self.assertEqual(self.make_cache().get('post'), {'text': 'Пост'})
+        self.assertEqual(self.make_cache().get_many(['post', 'missing']),
+                         {'post': {'text': 'Пост'}})
+
+    def test_add_and_expiry(self):
+        """add() не перезаписывает живой ключ, истёкший ключ не читается"""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.cache.set('key', 3, timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 4))
+        self.assertEqual(self.cache.get('key'), 4)
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr() из нескольких процессов не теряет обновления"""
+        self.cache.set('counter', 0, None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_evicted(self):
+        """При переполнении вытесняются давно не читавшиеся записи"""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, CULL_EVERY=1, TOUCH_INTERVAL=0
+        )
+        for key in 'abc':
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get_many('abcd'),
+                         {'a': 'a', 'c': 'c', 'd': 'd'})
+
+    def test_size_limit(self):
+        """Объём кэша не превышает MAX_SIZE"""
+        cache = self.make_cache(MAX_SIZE=3000, CULL_EVERY=1)
+        for key in 'abcd':
+            cache.set(key, 'x' * 900)
+            time.sleep(0.01)
+        self.assertEqual(set(cache.get_many('abcd')), {'b', 'c', 'd'})
+
+    def test_reads_do_not_wait_for_writer(self):
+        """Чтение не ждёт транзакцию записи другого процесса"""
+        self.cache.set('key', 'value')
+        writer = sqlite3.connect(self.path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            cache = self.make_cache(TOUCH_INTERVAL=0)
+            started = time.monotonic()
+            self.assertEqual(cache.get('key'), 'value')
+            self.assertEqual(cache.get_many(['key']), {'key': 'value'})
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+        cache.set('other', 'value')
+        self.assertEqual(
+            cache._connection().execute('PRAGMA busy_timeout').fetchone(),
+            (5000,),
+        )
+
+    def test_culled_every_n_writes(self):
+        """Переполнение проверяется раз в CULL_EVERY записей"""
+        cache = self.make_cache(
+            MAX_ENTRIES=2, CULL_FREQUENCY=2, CULL_EVERY=4
+        )
+        for key in 'abc':
+            cache.set(key, key)
+        self.assertEqual(len(cache.get_many('abc')), 3)
+        cache.set('d', 'd')
+        self.assertEqual(len(cache.get_many('abcd')), 2)
+
+
+class WSGIAdapterTests(TestCase):
+    def call(self, application, scope, messages):
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        adapter = WSGIAdapter(application, threads=2)
+        asyncio.run(adapter(scope, receive, send))
+        return sent
+
+    def scope(self, method='GET', path='/', query=b'', headers=()):
+        return {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query,
+            'headers': list(headers),
+        }
+
+    def test_request_passed_to_wsgi(self):
+        """Путь, заголовки и тело запроса доходят до WSGI-приложения"""
+        def application(environ, start_response):
+            start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+            body = environ['wsgi.input'].read()
+            return [environ['QUERY_STRING'].encode(), b'|',
+                    environ['HTTP_X_TOKEN'].encode(), b'|', body]
+
+        sent = self.call(
+            application,
+            self.scope('POST', '/posts/', b'q=1', [(b'x-token', b'abc')]),
+            [
+                {'type': 'http.request', 'body': b'te', 'more_body': True},
+                {'type': 'http.request', 'body': b'xt'},
+            ],
+        )
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'x-path', b'/posts/'), sent[0]['headers'])
+        self.assertEqual(sent[1]['body'], b'q=1|abc|text')
+
+    def test_repeated_cookie_headers_joined_with_semicolon(self):
+        """Повторы Cookie склеиваются через '; ', остальные - запятой"""
+        environ = build_environ(
+            self.scope(headers=[
+                (b'cookie', b'sessionid=abc'),
+                (b'cookie', b'csrftoken=xyz'),
+                (b'accept', b'text/html'),
+                (b'accept', b'*/*'),
+            ]),
+            BytesIO(),
+        )
+        self.assertEqual(
+            environ['HTTP_COOKIE'], 'sessionid=abc; csrftoken=xyz'
+        )
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,*/*')
+
+    def test_django_page_served(self):
+        """Страница Django отдаётся через ASGI"""
+        sent = self.call(
+            asgi.application.application,
+            self.scope(path='/about/tech/'),
+            [{'type': 'http.request'}],
+        )
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn('</html>', sent[1]['body'].decode())
+
+    def test_streaming_response_sent_in_chunks(self):
+        """Потоковый ответ отправляется по частям"""
+        class Streaming(list):
+            streaming = True
+
+        def application(environ, start_response):
+            start_response('200 OK', [])
+            return Streaming([b'one', b'two'])
+
+        sent = self.call(application, self.scope(), [{'type': 'http.request'}])
+        self.assertEqual(
+            [message.get('body') for message in sent],
+            [None, b'one', b'two', b''],
+        )
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки"""
+        sent = self.call(
+            lambda environ, start_response: [],
+            {'type': 'lifespan'},
+            [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}],
+        )
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+        )
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.samples.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def test_response_has_server_timing(self):
+        """Ответ содержит время SQL, шаблонов, кэша и общее"""
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(name, timing)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_hits'] + record['cache_misses'], 0)
+
+    def test_percentiles_for_staff_only(self):
+        """Перцентили по URL видит только администратор"""
+        url = reverse('performance')
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        client = Client()
+        client.force_login(admin)
+        summary = client.get(url).json()
+        self.assertEqual(summary['posts:index']['requests'], 3)
+        self.assertLessEqual(
+            summary['posts:index']['p50_ms'],
+            summary['posts:index']['p99_ms'],
+        )
+
+    @override_settings(PERF_METRICS=False)
+    def test_disabled(self):
+        """PERF_METRICS=False отключает замеры"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics.samples.summary(), {})
+
+
+class ProfilerTests(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def test_sampler_folds_stacks(self):
+        """Стеки потока записываются от корня к листу"""
+        sampler = profiler.Sampler(threading.get_ident(), 0.001).start()
+
+        def busy():
+            deadline = time.monotonic() + 0.05
+            while time.monotonic() < deadline:
+                pass
+        busy()
+        stacks = sampler.stop()
+        self.assertTrue(stacks)
+        stack = stacks.most_common(1)[0][0]
+        self.assertIn('busy', stack.split(';')[-1])
+        path = os.path.join(self.directory, 'busy.folded')
+        sampler.write(path)
+        with open(path) as file:
+            line = file.readline()
+        self.assertRegex(line, r'^\S.*;.* \d+$')
+
+    def get(self, url, **headers):
+        with override_settings(PROFILE_DIR=self.directory):
+            return self.client.get(url, **headers)
+
+    def test_signed_header_profiles_posts_views(self):
+        """Запрос с подписанным заголовком профилируется"""
+        response = self.get(
+            reverse('posts:index'), HTTP_X_PROFILE=profiler.make_token()
+        )
+        self.assertTrue(response['X-Profile'].startswith('posts-index-'))
+        self.assertEqual(os.listdir(self.directory), [response['X-Profile']])
+
+    def test_no_profile_without_permission(self):
+        """Без подписи, вне постов и при нулевой доле профиля нет"""
+        responses = [
+            self.get(reverse('posts:index'), HTTP_X_PROFILE='forged'),
+            self.get(reverse('posts:index')),
+            self.get(
+                reverse('about:author'), HTTP_X_PROFILE=profiler.make_token()
+            ),
+        ]
+        for response in responses:
+            self.assertFalse(response.has_header('X-Profile'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sample_rate(self):
+        """Доля PROFILE_SAMPLE_RATE профилируется без заголовка"""
+        response = self.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('X-Profile'))
+
+
+class TemplateWarmupTests(TestCase):
+    def test_warm_parses_every_template(self):
+        """warm() разбирает все шаблоны из templates/"""
+        names = [name for name, _ in templates.warm()]
+        for name in ('base.html', 'includes/nav.html', 'posts/index.html'):
+            self.assertIn(name, names)
+        self.assertIn('base.html', templates.timings.summary())
+
+    def test_render_timings_for_staff(self):
+        """Время отрисовки шаблонов видит только администратор"""
+        templates.timings.clear()
+        self.client.get(reverse('about:tech'))
+        url = reverse('template_performance')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        admin = User.objects.create_user(username='admin', is_staff=True)
+        self.client.force_login(admin)
+        summary = self.client.get(url).json()
+        self.assertEqual(summary['about/tech.html']['renders'], 1)
+        self.assertGreater(summary['about/tech.html']['render_avg_ms'], 0)
+
+
+class ShowNavTests(TestCase):
+    def render(self, source):
+        return Template('{% load user_filters %}' + source).render(Context())
+
+    def test_guest_and_user_menus(self):
+        """Гость видит вход, пользователь - своё имя и ссылку на профиль"""
+        guest = self.render('{% show_nav %}')
+        self.assertIn(reverse('users:login'), guest)
+        self.assertNotIn(reverse('users:logout'), guest)
+        user = self.render('{% show_nav "leo" %}')
+        self.assertIn(reverse('users:logout'), user)
+        self.assertIn(
+            f'href="{reverse("posts:profile", args=("leo",))}"', user
+        )
+        self.assertIn('<U>leo</U>', user)
+        self.assertNotIn(user_filters.USERNAME_MARK, user)
+
+    def test_menu_rendered_once(self):
+        """Меню отрисовывается один раз, имя подставляется в готовый HTML"""
+        user_filters.cached_nav.cache_clear()
+        with mock.patch.object(
+            user_filters, 'render_to_string',
+            wraps=user_filters.render_to_string,
+        ) as render:
+            first = self.render('{% show_nav "leo" %}')
+            second = self.render('{% show_nav "ann" %}')
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.replace('leo', 'ann'), second)
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+        super().tearDown()
+
+    def test_minify_css_keeps_strings(self):
+        """Сжатие CSS не трогает строки и лицензионные комментарии"""
+        css = (
+            '/*! license */\n/* note */\na > b ,  c {\n  color : red;\n'
+            "  background: url('a  b.svg');\n}\n"
+        )
+        self.assertEqual(
+            staticfiles.minify_css(css),
+            "/*! license */ a>b,c{color :red;background:url('a  b.svg')}",
+        )
+
+    def test_minify_js_keeps_literals(self):
+        """Сжатие JS не трогает строки, шаблоны и регулярные выражения"""
+        js = (
+            '// note\nconst t = `a\n    // b\n`;  // c\n'
+            'const s = "x  // y";\n\n    if (t) {\n'
+            '        return /["`]\\//.test(s) / 2;\n    }\n'
+        )
+        self.assertEqual(
+            staticfiles.minify_js(js),
+            'const t = `a\n    // b\n`;\nconst s = "x  // y";\n'
+            'if (t) {\nreturn /["`]\\//.test(s) / 2;\n}',
+        )
+
+    def test_localize_fonts(self):
+        """Шрифты из CSS Google Fonts скачиваются и подключаются локально"""
+        css = 'src: url(https://fonts.gstatic.com/s/lora/v1/a.woff2);'
+        local, files = localize_fonts(css, fetch=lambda url: b'font')
+        self.assertEqual(local, 'src: url(a.woff2);')
+        self.assertEqual(files, {'a.woff2': b'font'})
+
+    def test_collected_files_served_compressed_and_cached(self):
+        """collectstatic готовит пачки с хэшем, отдаются они сжатыми"""
+        with override_settings(
+            STATIC_PIPELINE=True,
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE='core.staticfiles.PipelineStorage',
+            VENDOR_ASSETS={},
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles.bundle_urls('css/site.css')[0]
+            middleware = staticfiles.StaticFilesMiddleware(
+                lambda request: HttpResponse(status=404)
+            )
+            factory = RequestFactory()
+            response = middleware(
+                factory.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+            )
+            plain = middleware(factory.get('/static/css/site.css'))
+        self.assertRegex(url, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', plain['Cache-Control'])
+        with open(os.path.join(self.root, 'css', 'site.css')) as file:
+            self.assertNotIn('\n\n', file.read())
+
+    def test_collectstatic_warns_about_missing_vendored_files(self):
+        """Без локальных копий CDN collectstatic предупреждает и собирает"""
+        with override_settings(
+            STATIC_PIPELINE=True,
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE='core.staticfiles.PipelineStorage',
+            VENDOR_ASSETS={'vendor/missing.js': 'https://cdn.example/a.js'},
+        ):
+            with self.assertLogs('core.staticfiles', 'WARNING') as logs:
+                call_command(
+                    'collectstatic', interactive=False, verbosity=0
+                )
+        self.assertIn('vendor/missing.js', logs.output[0])
+        self.assertTrue(
+            os.path.exists(os.path.join(self.root, 'css', 'site.css'))
+        )
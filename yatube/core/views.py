@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .metrics import samples
+from .templates import timings
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,19 @@ def forbidden(request, exception):
 
 def internal_server_error(request):
     return render(request, 'core/500.html', {'path': request.path}, status=500)
+
+
+@staff_member_required
+def performance(request):
+    """Перцентили времени ответа по именам URL для администраторов."""
+    return JsonResponse(
+        samples.summary(), json_dumps_params={'ensure_ascii': False}
+    )
+
+
+@staff_member_required
+def template_performance(request):
+    """Время разбора и отрисовки каждого шаблона для администраторов."""
+    return JsonResponse(
+        timings.summary(), json_dumps_params={'ensure_ascii': False}
+    )
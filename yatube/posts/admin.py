@@ -1,6 +1,8 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import get_backend
+from .tasks import generate_image_variants
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +11,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    search_limit = 1000
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if obj.image and (not change or 'image' in form.changed_data):
+            generate_image_variants.delay(obj.pk)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = get_backend().search(search_term, self.search_limit)
+        return queryset.filter(pk__in=ids), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -0,0 +1,277 @@
+"""Кэш отрисованных карточек постов и целых страниц лент.
+
+Ключ карточки содержит версии поста и автора, ключ страницы -
+поколение ленты (общей, группы или автора). Сигналы моделей увеличивают
+версии, и устаревшие записи кэша просто перестают читаться.
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
+
+from core.metrics import count_cache
+from core.routers import (
+    primary_reads, reading_from_replicas, replicas_caught_up
+)
+
+from .models import Group, Post, User
+
+
+CARD_TEMPLATE = 'includes/article.html'
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def version_key(kind, pk):
+    return f'version:{kind}:{pk}'
+
+
+def modified_key(kind, pk):
+    return f'modified:{kind}:{pk}'
+
+
+def bump_version(kind, pk):
+    try:
+        cache.incr(version_key(kind, pk))
+    except ValueError:
+        # Версия вытеснена из кэша: новая начальная версия строится
+        # от времени и потому не совпадёт ни с одной из прежних.
+        cache.add(version_key(kind, pk), time.time_ns(), None)
+    cache.set(modified_key(kind, pk), time.time(), None)
+
+
+def _get_or_add(initials):
+    """Значения ключей кэша; отсутствующие заполняются из initials."""
+    values = cache.get_many(initials)
+    count_cache(len(values), len(initials) - len(values))
+    for key in initials.keys() - values.keys():
+        cache.add(key, initials[key], None)
+        values[key] = cache.get(key, initials[key])
+    return values
+
+
+def get_versions(items):
+    """Версии для пар (вид, pk) одним запросом к кэшу."""
+    now = time.time_ns()
+    return _get_or_add({version_key(kind, pk): now for kind, pk in items})
+
+
+def card_key(post, versions):
+    return 'card:{}:{}:{}'.format(
+        post.pk,
+        versions[version_key('post', post.pk)],
+        versions[version_key('user', post.author_id)],
+    )
+
+
+def recently_changed(posts):
+    """pk постов, которые или чьих авторов правили, пока реплики могут
+    отставать."""
+    keys = [
+        key for post in posts for key in (
+            modified_key('post', post.pk),
+            modified_key('user', post.author_id),
+        )
+    ]
+    times = cache.get_many(keys)
+    return [
+        post.pk for post in posts if not replicas_caught_up(max(
+            times.get(modified_key('post', post.pk), 0),
+            times.get(modified_key('user', post.author_id), 0),
+        ))
+    ]
+
+
+def render_cards(posts):
+    """Пары (пост, html карточки); карточки страницы читаются пачкой."""
+    posts = list(posts)
+    items = []
+    for post in posts:
+        items += [('post', post.pk), ('user', post.author_id)]
+    versions = get_versions(items)
+    keys = [card_key(post, versions) for post in posts]
+    cards = cache.get_many(keys)
+    count_cache(len(cards), len(keys) - len(cards))
+    stale = {
+        key: post for key, post in zip(keys, posts) if key not in cards
+    }
+    recent = recently_changed(stale.values()) if (
+        stale and reading_from_replicas()
+    ) else []
+    if recent:
+        # Реплика может ещё не знать правок, версии которых уже в ключе.
+        with primary_reads():
+            fresh = Post.objects.select_related('author', 'group').in_bulk(
+                recent
+            )
+        stale = {
+            key: fresh.get(post.pk, post) for key, post in stale.items()
+        }
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in stale.items()
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIME)
+        cards.update(missing)
+    return [(post, mark_safe(cards[key])) for key, post in zip(keys, posts)]
+
+
+def bump_pages(group_ids=(), user_ids=()):
+    """Сбрасывает общую ленту и страницы перечисленных групп и авторов."""
+    bump_version('index_page', 'index')
+    group_ids = {pk for pk in group_ids if pk}
+    if group_ids:
+        slugs = Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True
+        )
+        for slug in slugs:
+            bump_version('group_page', slug)
+    user_ids = {pk for pk in user_ids if pk}
+    if user_ids:
+        usernames = User.objects.filter(pk__in=user_ids).values_list(
+            'username', flat=True
+        )
+        for username in usernames:
+            bump_version('profile_page', username)
+
+
+def bump_user_pages(user):
+    """Сбрасывает все страницы, на которых показаны посты автора."""
+    group_ids = Post.objects.filter(author=user).values_list(
+        'group_id', flat=True
+    ).distinct()
+    bump_pages(group_ids=group_ids, user_ids=[user.pk])
+
+
+def bump_group_pages(group):
+    """Сбрасывает все страницы, на которых показаны посты группы."""
+    author_ids = Post.objects.filter(group=group).values_list(
+        'author_id', flat=True
+    ).distinct()
+    bump_pages(group_ids=[group.pk], user_ids=author_ids)
+
+
+def page_validators(request, items):
+    """ETag и время изменения страницы по версиям её составляющих.
+
+    Страница не рендерится: тег строится из адреса, пользователя, его
+    CSRF-секрета и версий пар (вид, pk), время изменения - самое позднее
+    из времён их сброса. Секрет меняется при каждом входе, поэтому копия
+    с формой и устаревшим CSRF-токеном не получает 304.
+    """
+    now = time.time()
+    initials = {}
+    for kind, pk in items:
+        initials[version_key(kind, pk)] = time.time_ns()
+        initials[modified_key(kind, pk)] = now
+    values = _get_or_add(initials)
+    parts = [
+        request.get_full_path(),
+        str(request.user.pk or 0),
+        request.META.get('CSRF_COOKIE', '') if request.user.is_authenticated
+        else '',
+    ]
+    parts += [f'{key}={values[key]}' for key in sorted(initials)]
+    etag = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    modified = max(values[modified_key(kind, pk)] for kind, pk in items)
+    return quote_etag(etag), int(modified)
+
+
+def set_validators(request, response, etag, modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    patch_cache_control(
+        response, no_cache=True, private=request.user.is_authenticated
+    )
+    return response
+
+
+def not_modified(request, etag, modified):
+    """Ответ 304, если копия клиента совпадает с текущей страницей."""
+    if request.method not in SAFE_METHODS:
+        return None
+    # If-Modified-Since не знает о смене CSRF-секрета, поэтому
+    # пользователю копию подтверждает только ETag.
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=None if request.user.is_authenticated else modified,
+    )
+    if response is None:
+        return None
+    return set_validators(request, response, etag, modified)
+
+
+def post_page_items(post, comments=()):
+    """Составляющие страницы поста: сам пост, автор, группа, профиль
+    автора, поколение которого меняется вместе с его числом постов, и
+    авторы показанных комментариев."""
+    items = [
+        ('post', post.pk),
+        ('user', post.author_id),
+        ('profile_page', post.author.username),
+    ]
+    if post.group_id:
+        items.append(('group', post.group_id))
+    items += [
+        ('user', author_id)
+        for author_id in sorted({comment.author_id for comment in comments})
+        if author_id != post.author_id
+    ]
+    return items
+
+
+@contextmanager
+def fresh_reads(modified):
+    """Чтения для страницы, последний раз изменённой в момент modified.
+
+    Страница читается с реплик, если они уже догнали это изменение, иначе
+    из основной базы: старые строки не должны попасть в кэш под новой
+    версией. Внутри блока - True, если чтения переключены на основную.
+    """
+    if reading_from_replicas() and not replicas_caught_up(modified):
+        with primary_reads():
+            yield True
+    else:
+        yield False
+
+
+def cached_page(kind, kwarg=None):
+    """Кэширует GET-ответ ленты до смены её поколения.
+
+    Ответ хранится отдельно для каждого пользователя: шапка страницы и
+    кнопки подписки зависят от того, кто её смотрит. Клиенту с той же
+    копией страницы отвечает 304 Not Modified.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return view(request, *args, **kwargs)
+            scope = kwargs[kwarg] if kwarg else kind
+            etag, modified = page_validators(
+                request, [(f'{kind}_page', scope)]
+            )
+            response = not_modified(request, etag, modified)
+            if response is not None:
+                return response
+            key = 'page:{}:{}'.format(kind, etag.strip('"'))
+            response = cache.get(key)
+            count_cache(response is not None, response is None)
+            if response is None:
+                with fresh_reads(modified):
+                    response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                set_validators(request, response, etag, modified)
+                cache.set(key, response, settings.PAGE_CACHE_TIME)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,67 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F()-выражения в сигналах моделей, а
+команда reconcile_counters пересчитывает их, если они разошлись.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _shift(field, delta):
+    return Greatest(F(field) + delta, 0)
+
+
+def change_user_stats(user_id, **deltas):
+    updates = {field: _shift(field, delta) for field, delta in deltas.items()}
+    if UserStats.objects.filter(user_id=user_id).update(**updates):
+        return
+    if min(deltas.values()) > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**updates)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shift('comments_count', delta)
+    )
+
+
+def count_of(model, field):
+    """Подзапрос: число строк model, у которых field = pk внешней строки."""
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(
+        Subquery(
+            rows.values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile():
+    """Пересчитывает все счётчики; возвращает число исправленных строк."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing.iterator()],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    fixed = {}
+    actual = {
+        'posts_count': count_of(Post, 'author'),
+        'followers_count': count_of(Follow, 'author'),
+        'following_count': count_of(Follow, 'user'),
+    }
+    for field, expression in actual.items():
+        fixed[field] = UserStats.objects.exclude(
+            **{field: expression}
+        ).update(**{field: expression})
+    comments = count_of(Comment, 'post')
+    fixed['comments_count'] = Post.objects.exclude(
+        comments_count=comments
+    ).update(comments_count=comments)
+    return fixed
@@ -1,5 +1,6 @@
 from django import forms
 
+from . import images
 from .models import Comment, Post
 
 
@@ -13,6 +14,23 @@ class PostForm(forms.ModelForm):
             'image': 'Добавить изображение',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not hasattr(image, 'image'):
+            # Картинку не меняли или убрали.
+            return image
+        master = images.master_copy(image)
+        self.instance.image_width = master.width
+        self.instance.image_height = master.height
+        self.instance.image_hash = master.digest
+        return images.find_duplicate(master) or master.file
+
+    def save(self, commit=True):
+        if not self.cleaned_data.get('image'):
+            self.instance.image_width = self.instance.image_height = None
+            self.instance.image_hash = ''
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,275 @@
+"""Приём загруженных картинок и подготовка их уменьшенных копий.
+
+Загрузка проверяется и перекодируется в мастер-копию до сохранения:
+хранится только она, а одинаковые картинки хранятся один раз.
+
+Копии строятся фоновой задачей после сохранения поста, а их адреса
+записываются в Post.image_variants: шаблоны берут готовые URL и не
+обращаются к бэкенду миниатюр во время запроса. Копии нескольких ширин
+попадают в srcset, и браузер скачивает ту, что нужна экрану. Копия для
+ленты строится сразу при загрузке, чтобы до работы задачи лента не
+отдавала мастер-копию целиком.
+"""
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import features, Image, ImageOps
+
+from . import caching
+from .models import Post
+
+
+# Форматы, которые принимаются при загрузке и сохраняются без смены.
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+LOSSY = ('JPEG', 'WEBP')
+
+
+class Master:
+    """Перекодированная картинка, которая будет храниться."""
+
+    def __init__(self, content, width, height):
+        self.file = content
+        self.width = width
+        self.height = height
+        self.digest = hashlib.sha256(content.read()).hexdigest()
+        content.seek(0)
+
+
+def digest(storage, name):
+    sha = hashlib.sha256()
+    with storage.open(name, 'rb') as file:
+        for chunk in iter(lambda: file.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def master_copy(upload):
+    """Проверяет загрузку и готовит её мастер-копию.
+
+    Image.open читает только заголовок, поэтому формат и число пикселей
+    проверяются до декодирования. JPEG сразу декодируется в уменьшенном
+    масштабе (draft), картинка поворачивается по EXIF и перекодируется без
+    метаданных, не больше IMAGE_MASTER_SIZE по большей стороне. Анимации
+    хранятся как загружены: пережатие оставило бы один кадр.
+    """
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)},
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является картинкой.', code='invalid')
+    image_format = image.format
+    if image_format not in EXTENSIONS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image_format},
+        )
+    if image.width * image.height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': f'{settings.IMAGE_MAX_PIXELS / 10 ** 6:g}'},
+        )
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    name = f'{stem}.{EXTENSIONS[image_format]}'
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return Master(ContentFile(upload.read(), name), *image.size)
+    size = settings.IMAGE_MASTER_SIZE
+    # draft() сравнивает обе стороны, поэтому ему нужен итоговый размер.
+    ratio = min(size / max(image.size), 1)
+    image.draft(None, (
+        max(round(image.width * ratio), 1),
+        max(round(image.height * ratio), 1),
+    ))
+    try:
+        image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError('Картинка повреждена.', code='invalid')
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {'optimize': True}
+    if image_format in LOSSY:
+        options['quality'] = settings.IMAGE_MASTER_QUALITY
+    for key in ('icc_profile', 'transparency'):
+        if image.info.get(key) is not None:
+            options[key] = image.info[key]
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return Master(ContentFile(buffer.getvalue(), name), *image.size)
+
+
+def find_duplicate(master):
+    """Имя уже сохранённого файла с тем же содержимым или None.
+
+    Хэш в посте мог устареть, если картинку заменили в обход формы,
+    поэтому содержимое найденного файла сверяется заново.
+    """
+    storage = Post._meta.get_field('image').storage
+    names = Post.objects.filter(image_hash=master.digest).exclude(
+        image=''
+    ).order_by().values_list('image', flat=True).distinct()
+    for name in names:
+        if storage.exists(name) and digest(storage, name) == master.digest:
+            return name
+    return None
+
+
+def shared_variants(post):
+    """Готовые копии того же файла из другого поста с теми же размерами."""
+    row = Post.objects.filter(image=post.image.name).exclude(
+        pk=post.pk
+    ).exclude(image_variants='').values_list(
+        'image_variants', 'image_width', 'image_height'
+    ).first()
+    if row is None:
+        return None
+    variants = json.loads(row[0])
+    if not is_current(variants, post.image.name):
+        return None
+    return variants, row[1], row[2]
+
+
+def is_current(variants, source) -> bool:
+    """Копии построены из source и во всех размерах из настроек."""
+    sizes = [
+        (variant['width'], variant['height'])
+        for variant in variants.get('jpeg', ())
+    ]
+    return variants.get('source') == source and sizes == list(
+        settings.IMAGE_VARIANT_SIZES
+    )
+
+
+def stale_variant_ids():
+    """id постов с картинкой, у которых копий нет или они устарели."""
+    rows = Post.objects.exclude(image='').values_list(
+        'pk', 'image', 'image_variants'
+    )
+    for pk, source, variants in rows.iterator():
+        if not variants or not is_current(json.loads(variants), source):
+            yield pk
+
+
+def formats():
+    result = [('JPEG', 'jpeg')]
+    if features.check('webp'):
+        result.append(('WEBP', 'webp'))
+    # AVIF пишет только Pillow со встроенным libavif или с плагином.
+    Image.init()
+    if 'AVIF' in Image.SAVE:
+        result.append(('AVIF', 'avif'))
+    return result
+
+
+def _open(field):
+    with field.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+
+def feed_size():
+    """Размер копии из настроек, ближайший к ширине ленты."""
+    return min(
+        settings.IMAGE_VARIANT_SIZES,
+        key=lambda size: abs(size[0] - settings.IMAGE_FEED_WIDTH),
+    )
+
+
+def generate_variants(post_id):
+    """Строит все размеры и форматы картинки и сохраняет их адреса.
+
+    Если тот же файл уже разобран для другого поста, берутся его копии.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    shared = shared_variants(post)
+    if shared is not None:
+        store_variants(post, *shared)
+    else:
+        store_variants(post, *build_variants(post))
+
+
+def generate_feed_variant(post):
+    """Строит при загрузке только JPEG-копию для ленты.
+
+    Остальные размеры и форматы достраивает generate_variants и берёт эту
+    копию из уже сохранённых.
+    """
+    shared = shared_variants(post)
+    if shared is not None:
+        store_variants(post, *shared)
+        return
+    original = _open(post.image)
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    size = feed_size()
+    image = ImageOps.fit(original, size, Image.LANCZOS)
+    variants = {
+        'source': post.image.name,
+        'jpeg': [save_variant(post, stem, image, 'JPEG', 'jpeg')],
+    }
+    store_variants(post, variants, original.width, original.height)
+
+
+def store_variants(post, variants, width, height):
+    updated = Post.objects.filter(pk=post.pk, image=post.image.name).update(
+        image_variants=json.dumps(variants),
+        image_width=width,
+        image_height=height,
+    )
+    if updated:
+        caching.bump_version('post', post.pk)
+        caching.bump_pages(
+            group_ids=[post.group_id], user_ids=[post.author_id]
+        )
+
+
+def save_variant(post, stem, image, image_format, extension):
+    storage = post.image.storage
+    width, height = image.size
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=85, optimize=True)
+    name = storage.save(
+        f'posts/derived/{post.pk}_{stem}_{width}x{height}.{extension}',
+        ContentFile(buffer.getvalue()),
+    )
+    return {'width': width, 'height': height, 'url': storage.url(name)}
+
+
+def build_variants(post):
+    source = post.image.name
+    original = _open(post.image)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    # Копии, построенные при загрузке, не пересобираются.
+    ready = {
+        (variant['width'], variant['height']): variant
+        for variant in post.variants.get('jpeg', ())
+    }
+    variants = {'source': source}
+    for size in settings.IMAGE_VARIANT_SIZES:
+        image = ImageOps.fit(original, size, Image.LANCZOS)
+        for image_format, extension in formats():
+            if extension == 'jpeg' and size in ready:
+                variant = ready[size]
+            else:
+                variant = save_variant(
+                    post, stem, image, image_format, extension
+                )
+            variants.setdefault(extension, []).append(variant)
+    return variants, original.width, original.height
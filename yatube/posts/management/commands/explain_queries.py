@@ -0,0 +1,123 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+
+DUMMY_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+# Таблицы, которые читаются целиком намеренно: форма поста выводит
+# список всех групп.
+WHOLE_TABLES = ('posts_group',)
+
+
+def full_scans(plan):
+    """Строки плана, в которых таблица читается целиком без индекса."""
+    scans = []
+    for detail in plan:
+        if not detail.startswith('SCAN ') or ' USING ' in detail:
+            continue
+        table = detail.split()[1]
+        if table.startswith('(') or table in WHOLE_TABLES:
+            continue
+        if 'VIRTUAL TABLE' not in detail:
+            scans.append(detail)
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Открывает страницы постов и показывает EXPLAIN QUERY PLAN их '
+        'запросов, отмечая полные просмотры таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных',
+        )
+
+    def urls(self, post):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=(post.author.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+            reverse('posts:post_comments', args=(post.pk,)),
+            reverse('posts:post_edit', args=(post.pk,)),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=' + (post.text.split() or [''])[0],
+        ]
+        if post.group is not None:
+            urls.append(reverse('posts:group_list', args=(post.group.slug,)))
+        return urls
+
+    def explain(self, alias, sql):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def check_url(self, client, url, all_plans):
+        """Печатает планы запросов страницы; возвращает число просмотров."""
+        # Запросы могут уйти на реплики, поэтому слушаем каждую базу.
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in settings.DATABASES
+            }
+            client.get(url)
+        total = sum(len(context) for context in contexts.values())
+        self.stdout.write(f'{url}: запросов {total}')
+        problems = 0
+        for alias, context in contexts.items():
+            for query in context.captured_queries:
+                problems += self.check_query(alias, query['sql'], all_plans)
+        return problems
+
+    def check_query(self, alias, sql, all_plans):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return 0
+        plan = self.explain(alias, sql)
+        scans = full_scans(plan)
+        if scans or all_plans:
+            self.stdout.write(f'  [{alias}] {sql}')
+            for detail in plan:
+                if detail in scans:
+                    detail = self.style.ERROR(detail)
+                self.stdout.write(f'    {detail}')
+        return len(scans)
+
+    def handle(self, *args, **options):
+        if any(connections[alias].vendor != 'sqlite'
+               for alias in settings.DATABASES):
+            raise CommandError('Команда разбирает планы только SQLite')
+        posts = Post.objects.select_related('author', 'group')
+        post = posts.filter(group__isnull=False).first() or posts.first()
+        if post is None:
+            raise CommandError('В базе нет постов: нечего проверять')
+        # Вход пишет last_login и сессию: всё, что изменят страницы,
+        # откатывается, чтобы проверка не трогала рабочую базу.
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(transaction.atomic(using=alias))
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            client.force_login(post.author)
+            # Без кэша страницы действительно обращаются к базе.
+            with override_settings(CACHES=DUMMY_CACHE):
+                problems = sum(
+                    self.check_url(client, url, options['all_plans'])
+                    for url in self.urls(post)
+                )
+            for alias in settings.DATABASES:
+                transaction.set_rollback(True, using=alias)
+        if problems:
+            raise CommandError(f'Полных просмотров таблиц: {problems}')
+        self.stdout.write(self.style.SUCCESS('Полных просмотров таблиц нет'))
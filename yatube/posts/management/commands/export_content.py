@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в файл NDJSON; '
+        'прерванную выгрузку продолжает --resume'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint_path = f'{path}.checkpoint'
+        checkpoint = transfer.read_checkpoint(checkpoint_path)
+        if options['resume'] and checkpoint is None:
+            raise CommandError('Нет контрольной точки для продолжения')
+        if not options['resume']:
+            checkpoint = {'model': transfer.MODELS[0], 'after': 0,
+                          'offset': 0}
+        models = transfer.MODELS[transfer.MODELS.index(checkpoint['model']):]
+        mode = 'r+b' if options['resume'] and os.path.exists(path) else 'wb'
+        started = time.monotonic()
+        total = 0
+        with open(path, mode) as file:
+            file.seek(checkpoint['offset'])
+            file.truncate()
+            for model in models:
+                after = checkpoint['after'] if model == models[0] else 0
+                count = 0
+                for record in transfer.export_rows(
+                    model, after, options['chunk_size']
+                ):
+                    file.write(transfer.dumps(record))
+                    count += 1
+                    if count % options['chunk_size'] == 0:
+                        file.flush()
+                        transfer.write_checkpoint(checkpoint_path, {
+                            'model': model,
+                            'after': record['id'],
+                            'offset': file.tell(),
+                        })
+                total += count
+                self.report(model, count, total, started)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(f'Выгружено строк: {total}'))
+
+    def report(self, model, count, total, started):
+        rate = total / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{model}: {count} строк, {rate:.0f} строк/с')
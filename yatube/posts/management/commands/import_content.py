@@ -0,0 +1,97 @@
+import json
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import transfer
+
+NOTES = {
+    'renumbered_posts': 'Посты с занятым id сохранены под новым id',
+    'renumbered_comments': 'Комментарии с занятым id сохранены под новым id',
+    'orphan_comments': 'Пропущены комментарии к постам не из файла',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты, комментарии и подписки из файла NDJSON '
+        'пачками; прерванную загрузку продолжает --resume'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true')
+        parser.add_argument(
+            '--skip-refresh', action='store_true',
+            help='Не пересчитывать счётчики, поиск и ленты после загрузки',
+        )
+
+    def handle(self, *args, **options):
+        self.path = options['path']
+        self.checkpoint_path = f'{self.path}.checkpoint'
+        self.started = time.monotonic()
+        self.source = transfer.source_key(self.path)
+        self.total = self.resumed = 0
+        self.notes = Counter()
+        offset = 0
+        if options['resume']:
+            checkpoint = transfer.read_checkpoint(self.checkpoint_path)
+            if checkpoint is None:
+                raise CommandError('Нет контрольной точки для продолжения')
+            offset = checkpoint['offset']
+            self.total = self.resumed = checkpoint.get('total', 0)
+            self.notes.update(checkpoint.get('notes', {}))
+        else:
+            transfer.forget_ids(self.source)
+        model, rows = None, []
+        with open(self.path, 'rb') as file:
+            file.seek(offset)
+            for line in file:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.pop('model')
+                if kind not in transfer.LOADERS:
+                    raise CommandError(f'Неизвестная модель: {kind}')
+                if rows and (
+                    kind != model or len(rows) >= options['chunk_size']
+                ):
+                    self.flush(model, rows, start)
+                    rows = []
+                model = kind
+                rows.append(record)
+            if rows:
+                self.flush(model, rows, offset)
+        transfer.forget_ids(self.source)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        for note, title in NOTES.items():
+            if self.notes[note]:
+                self.stdout.write(self.style.WARNING(
+                    f'{title}: {self.notes[note]}'
+                ))
+        if not options['skip_refresh']:
+            transfer.refresh()
+            self.stdout.write('Счётчики, поисковый индекс и ленты пересчитаны')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {self.total}'
+        ))
+
+    def flush(self, model, rows, offset):
+        with transaction.atomic():
+            self.notes.update(transfer.load(model, rows, self.source))
+        self.total += len(rows)
+        transfer.write_checkpoint(
+            self.checkpoint_path,
+            {'offset': offset, 'total': self.total, 'notes': self.notes},
+        )
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = (self.total - self.resumed) / elapsed
+        self.stdout.write(
+            f'{model}: +{len(rows)}, всего {self.total}, {rate:.0f} строк/с'
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.tasks import queue_stale_variants
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь копии картинок постов, у которых их нет'
+
+    def handle(self, *args, **options):
+        count = queue_stale_variants()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено в очередь постов: {count}'
+        ))
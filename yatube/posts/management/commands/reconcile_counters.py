@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile()
+        for field, count in fixed.items():
+            self.stdout.write(f'{field}: исправлено строк {count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,269 @@
+import datetime
+import itertools
+import os
+import random
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts import transfer
+from posts.models import Comment, Follow, Group, Post, User
+
+
+# Даты отсчитываются от фиксированного момента, чтобы одинаковый --seed
+# давал одинаковые данные в любой день.
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+SENTENCES = 2000
+IMAGE_POOL = 20
+IMAGE_SIZE = (960, 640)
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса степенного распределения: первые - самые частые."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def chunked(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимым набором пользователей, групп, '
+        'постов, комментариев и подписок для замеров производительности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя',
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель степенного закона для авторов и подписок',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-refresh', action='store_true',
+            help='Не пересчитывать счётчики, поиск и ленты после загрузки',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options['prefix']
+        if User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).exists():
+            raise CommandError(
+                f'Данные с префиксом {self.prefix} уже есть: '
+                'выберите другой --prefix'
+            )
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        self.rnd = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        self.sentences = [fake.sentence() for _ in range(SENTENCES)]
+        self.words = [fake.word() for _ in range(SENTENCES)]
+        self.started = time.monotonic()
+        users = self.create_users()
+        # Авторы и кумиры выбираются по одному и тому же закону: у
+        # немногих пользователей большая часть постов и подписчиков.
+        self.rnd.shuffle(users)
+        self.weights = zipf_weights(len(users), options['exponent'])
+        self.users = users
+        groups = self.create_groups()
+        images = self.create_images()
+        with transfer.keep_dates():
+            posts = self.create_posts(groups, images)
+            self.create_comments(posts)
+        self.create_follows()
+        if not options['skip_refresh']:
+            transfer.refresh()
+            self.stdout.write('Счётчики, поисковый индекс и ленты пересчитаны')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - self.started:.1f} с'
+        ))
+
+    def insert(self, model, rows, label):
+        """Сохраняет строки пачками, каждую в своей транзакции."""
+        total = 0
+        for chunk in chunked(rows, self.options['batch_size']):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, ignore_conflicts=True)
+            total += len(chunk)
+            rate = total / max(time.monotonic() - self.started, 1e-6)
+            self.stdout.write(f'{label}: {total}, {rate:.0f} строк/с')
+        return total
+
+    def new_ids(self, model, rows, label):
+        """Сохраняет строки и возвращает диапазон их id.
+
+        bulk_create в SQLite не возвращает id, но новые строки получают
+        идущие подряд id после наибольшего существующего.
+        """
+        first = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        self.insert(model, rows, label)
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        return range(first, last + 1)
+
+    def pick_user(self):
+        return self.rnd.choices(self.users, cum_weights=self.weights)[0]
+
+    def text(self, sentences):
+        return ' '.join(self.rnd.choices(self.sentences, k=sentences))
+
+    def date(self):
+        seconds = self.rnd.randrange(self.options['days'] * 24 * 3600)
+        return EPOCH - datetime.timedelta(seconds=seconds)
+
+    def create_users(self):
+        # Один хэш на всех: PBKDF2 на каждого занял бы минуты.
+        password = make_password(self.prefix)
+        joined = timezone.now()
+        self.new_ids(User, (
+            User(
+                username=f'{self.prefix}_{number}',
+                first_name=self.rnd.choice(self.words).title(),
+                password=password,
+                date_joined=joined,
+            )
+            for number in range(self.options['users'])
+        ), 'Пользователи')
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self):
+        ids = self.new_ids(Group, (
+            Group(
+                title=self.text(1)[:200],
+                slug=f'{self.prefix}-{number}',
+                description=self.text(3),
+            )
+            for number in range(self.options['groups'])
+        ), 'Группы')
+        return list(ids)
+
+    def create_images(self):
+        """Небольшой набор картинок, общий для всех постов с картинкой."""
+        if not self.options['images']:
+            return []
+        names = []
+        for number in range(IMAGE_POOL):
+            color = tuple(self.rnd.randrange(256) for _ in range(3))
+            image = Image.new('RGB', IMAGE_SIZE, color)
+            draw = ImageDraw.Draw(image)
+            width, height = IMAGE_SIZE
+            for _ in range(8):
+                box = sorted(self.rnd.sample(range(width), 2)) + sorted(
+                    self.rnd.sample(range(height), 2)
+                )
+                draw.rectangle(
+                    (box[0], box[2], box[1], box[3]),
+                    fill=tuple(self.rnd.randrange(256) for _ in range(3)),
+                )
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            names.append(default_storage.save(
+                f'posts/{self.prefix}_{number}.jpg',
+                ContentFile(buffer.getvalue()),
+            ))
+        self.stdout.write(
+            f'Картинки: {len(names)} в '
+            f'{os.path.join(settings.MEDIA_ROOT, "posts")}'
+        )
+        return names
+
+    def image(self, images, share):
+        if not images or self.rnd.random() >= share:
+            return {'image': ''}
+        return {
+            'image': self.rnd.choice(images),
+            'image_width': IMAGE_SIZE[0],
+            'image_height': IMAGE_SIZE[1],
+        }
+
+    def create_posts(self, groups, images):
+        share = self.options['images']
+        group_share = 0.7 if groups else 0
+
+        def rows():
+            for _ in range(self.options['posts']):
+                yield Post(
+                    author_id=self.pick_user(),
+                    group_id=(
+                        self.rnd.choice(groups)
+                        if self.rnd.random() < group_share else None
+                    ),
+                    text=self.text(self.rnd.randint(1, 8)),
+                    pub_date=self.date(),
+                    **self.image(images, share),
+                )
+        return self.new_ids(Post, rows(), 'Посты')
+
+    def create_comments(self, posts):
+        if not posts:
+            return
+        # Комментарии тоже скапливаются под немногими постами.
+        weights = zipf_weights(len(posts), self.options['exponent'])
+
+        def rows():
+            for _ in range(self.options['comments']):
+                yield Comment(
+                    post_id=self.rnd.choices(posts, cum_weights=weights)[0],
+                    author_id=self.rnd.choice(self.users),
+                    text=self.text(self.rnd.randint(1, 2)),
+                    created=self.date(),
+                )
+        self.insert(Comment, rows(), 'Комментарии')
+
+    def create_follows(self):
+        """Граф подписок со степенным числом подписчиков у авторов."""
+        average = self.options['follows']
+        # Выборка по весам медленно добирает редких авторов, поэтому
+        # подписок не больше, чем на половину пользователей.
+        limit = (len(self.users) - 1) // 2
+
+        def rows():
+            for user in self.users:
+                count = min(
+                    int(self.rnd.expovariate(1 / average)) if average else 0,
+                    limit,
+                )
+                authors = set()
+                while len(authors) < count:
+                    author = self.pick_user()
+                    if author != user:
+                        authors.add(author)
+                for author in sorted(authors):
+                    yield Follow(user_id=user, author_id=author)
+        self.insert(Follow, rows(), 'Подписки')
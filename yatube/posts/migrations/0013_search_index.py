@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+        'body, kind UNINDEXED, post_id UNINDEXED, '
+        "tokenize = 'unicode61 remove_diacritics 0')"
+    )
+    from posts.search.stemmer import stems
+
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    rows = [
+        (pk * 2, ' '.join(stems(text)), 'post', pk)
+        for pk, text in Post.objects.values_list('id', 'text').iterator()
+    ] + [
+        (pk * 2 + 1, ' '.join(stems(text)), 'comment', post_id)
+        for pk, text, post_id in Comment.objects.values_list(
+            'id', 'text', 'post_id').iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_search (rowid, body, kind, post_id) '
+            'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_image_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='SHA-256 сохранённого файла: одинаковые картинки хранятся один раз', max_length=64, verbose_name='Хэш картинки'),
+        ),
+    ]
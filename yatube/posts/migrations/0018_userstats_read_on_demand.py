@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(read_on_demand=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='read_on_demand',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Посты читаются на лету'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_userstats_read_on_demand'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='MD5 пути к файлу NDJSON', max_length=32, verbose_name='Файл загрузки')),
+                ('source_id', models.PositiveIntegerField(verbose_name='id в файле')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'Перенумерованный пост',
+                'verbose_name_plural': 'Перенумерованные посты',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedpost',
+            constraint=models.UniqueConstraint(fields=('source', 'source_id'), name='unique_imported_post'),
+        ),
+    ]
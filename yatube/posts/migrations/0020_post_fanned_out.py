@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_imported_post'),
+    ]
+
+    operations = [
+        # Посты, опубликованные до поля, уже в лентах
+        migrations.AddField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(default=True, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='Пока пост не разложен, лента подписок читает его на лету', verbose_name='Разложен по лентам'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
@@ -7,6 +10,15 @@ from yatube.settings import LEN_LIMIT
 
 User = get_user_model()
 
+# Форматы копий для <source> в порядке предпочтения; JPEG идёт в <img>.
+SOURCE_FORMATS = (('avif', 'image/avif'), ('webp', 'image/webp'))
+
+
+def srcset(variants) -> str:
+    return ', '.join(
+        f'{variant["url"]} {variant["width"]}w' for variant in variants
+    )
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -19,7 +31,9 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        # Поиск по автору обслуживает post_author_pub_date_idx
+        db_index=False,
     )
     group = models.ForeignKey(
         'Group',
@@ -29,17 +43,73 @@ class Post(models.Model):
         verbose_name='Сообщество',
         related_name='group_posts',
         help_text='Соотношение поста к тематической группе',
+        # Поиск по группе обслуживает post_group_pub_date_idx
+        db_index=False,
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    # Не width_field/height_field: ImageField открывал бы файл при каждой
+    # загрузке поста, пока размеры не заполнены.
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Высота картинки',
+    )
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Хэш картинки',
+        help_text='SHA-256 сохранённого файла: одинаковые картинки '
+                  'хранятся один раз',
+    )
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Копии картинки',
+        help_text='JSON с адресами уменьшенных копий картинки',
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев',
+    )
+    fanned_out = models.BooleanField(
+        default=False,
+        editable=False,
+        db_index=True,
+        verbose_name='Разложен по лентам',
+        help_text='Пока пост не разложен, лента подписок читает его на лету',
+    )
 
     class Meta:
         verbose_name = "Публикация"
         verbose_name_plural = "Публикации"
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:LEN_LIMIT]
@@ -47,6 +117,51 @@ class Post(models.Model):
     def get_absolute_url(self):
         return reverse("posts:post_detail", kwargs={"post_id": self.pk})
 
+    @property
+    def variants(self) -> dict:
+        if not self.image_variants:
+            return {}
+        variants = json.loads(self.image_variants)
+        if variants.get('source') != self.image.name:
+            return {}
+        return variants
+
+    @property
+    def thumbnail(self) -> dict:
+        """Картинка для ленты: src, srcset по форматам и размеры для img.
+
+        Пока копий нет - исходная картинка с её собственными размерами.
+        """
+        variants = self.variants
+        jpegs = variants.get('jpeg')
+        if not jpegs:
+            return {
+                'url': self.image.url,
+                'srcset': '',
+                'sources': [],
+                'sizes': '',
+                'width': self.image_width,
+                'height': self.image_height,
+            }
+        feed = min(
+            jpegs,
+            key=lambda variant: abs(
+                variant['width'] - settings.IMAGE_FEED_WIDTH
+            ),
+        )
+        return {
+            'url': feed['url'],
+            'srcset': srcset(jpegs),
+            'sources': [
+                {'type': mime, 'srcset': srcset(variants[extension])}
+                for extension, mime in SOURCE_FORMATS
+                if variants.get(extension)
+            ],
+            'sizes': settings.IMAGE_SIZES,
+            'width': feed['width'],
+            'height': feed['height'],
+        }
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -71,6 +186,8 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments',
         verbose_name='К посту:',
+        # Поиск по посту обслуживает comment_post_created_idx
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -89,6 +206,12 @@ class Comment(models.Model):
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:LEN_LIMIT]
@@ -118,3 +241,92 @@ class Follow(models.Model):
                 fields=['user', 'author'],
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Публикация',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_timeline_entry',
+                fields=['user', 'post'],
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписок'
+    )
+    read_on_demand = models.BooleanField(
+        default=False,
+        verbose_name='Посты читаются на лету',
+        help_text='Посты автора не раскладываются по лентам подписчиков',
+    )
+
+    class Meta:
+        verbose_name = "Счётчики пользователя"
+        verbose_name_plural = "Счётчики пользователей"
+
+    def __str__(self):
+        return str(self.user)
+
+
+class ImportedPost(models.Model):
+    """Пост из загружаемого файла, сохранённый не под своим id."""
+    source = models.CharField(
+        max_length=32,
+        verbose_name='Файл загрузки',
+        help_text='MD5 пути к файлу NDJSON',
+    )
+    source_id = models.PositiveIntegerField(verbose_name='id в файле')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Публикация',
+    )
+
+    class Meta:
+        verbose_name = "Перенумерованный пост"
+        verbose_name_plural = "Перенумерованные посты"
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_imported_post',
+                fields=['source', 'source_id'],
+            )
+        ]
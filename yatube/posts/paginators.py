@@ -0,0 +1,161 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPage(Sequence):
+    """Страница ленты с непрозрачными токенами соседних страниц."""
+
+    def __init__(self, object_list, has_next, has_previous, paginator):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.paginator = paginator
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return ''
+        return self.paginator.encode(NEXT, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return ''
+        return self.paginator.encode(PREVIOUS, self.object_list[0])
+
+    @property
+    def last_cursor(self):
+        return self.paginator.encode(PREVIOUS)
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница выбирается условием WHERE по ключу последней показанной
+    записи, поэтому стоимость запроса не зависит от глубины страницы.
+    """
+
+    def __init__(self, queryset, per_page, keys=('pub_date', 'id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = keys
+
+    def encode(self, direction, obj=None):
+        values = []
+        if obj is not None:
+            for key in self.keys:
+                value = getattr(obj, key)
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                values.append(value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        """Возвращает (направление, значения ключа) или None."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            return None
+        if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+            return None
+        if values and len(values) != len(self.keys):
+            return None
+        field = self.queryset.model._meta.get_field
+        try:
+            values = [
+                field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if None in values:
+            return None
+        return direction, values
+
+    def _seek(self, values, lookup, keys=None):
+        condition = Q()
+        equal = {}
+        for key, value in zip(keys or self.keys, values):
+            condition |= Q(**equal, **{f'{key}__{lookup}': value})
+            equal[key] = value
+        return condition
+
+    def _ordered(self, queryset, descending=True, keys=None):
+        sign = '-' if descending else ''
+        return queryset.order_by(*(sign + key for key in keys or self.keys))
+
+    def _slice(self, queryset, values, descending, limit, offset=0,
+               keys=None):
+        """Сортирует выборку по ключу и отрезает строки после values."""
+        queryset = self._ordered(queryset, descending, keys)
+        if values:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(self._seek(values, lookup, keys))
+        return list(queryset[offset:offset + limit])
+
+    def _fetch(self, values, descending, limit, offset=0):
+        return self._slice(self.queryset, values, descending, limit, offset)
+
+    def _page(self, rows, has_next, has_previous):
+        return CursorPage(rows, has_next, has_previous, self)
+
+    def get_page(self, cursor=None, number=None):
+        """Страница по токену; номер страницы поддержан для старых ссылок."""
+        limit = self.per_page + 1
+        decoded = self.decode(cursor) if cursor else None
+        if decoded is None and number is not None:
+            return self._get_numbered_page(number)
+        if decoded is None:
+            rows = self._fetch(None, True, limit)
+            return self._page(rows[:self.per_page], len(rows) == limit, False)
+        direction, values = decoded
+        if direction == NEXT:
+            rows = self._fetch(values, True, limit)
+            return self._page(rows[:self.per_page], len(rows) == limit, True)
+        rows = self._fetch(values, False, limit)
+        has_previous = len(rows) == limit
+        rows = rows[:self.per_page][::-1]
+        return self._page(rows, bool(values), has_previous)
+
+    def _get_numbered_page(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        offset = (number - 1) * self.per_page
+        rows = self._fetch(None, True, self.per_page + 1, offset)
+        if not rows and number > 1:
+            return self.get_page(self.encode(PREVIOUS))
+        return self._page(
+            rows[:self.per_page], len(rows) > self.per_page, number > 1
+        )
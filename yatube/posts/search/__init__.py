@@ -0,0 +1,17 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Реализация индекса выбирается настройкой SEARCH_BACKEND.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@lru_cache(maxsize=None)
+def _load(path):
+    return import_string(path)()
+
+
+def get_backend():
+    return _load(settings.SEARCH_BACKEND)
@@ -0,0 +1,167 @@
+from django.db import connection
+from django.db.models import Q
+
+from posts.models import Comment, Post
+from .stemmer import stems
+
+
+class BaseSearchBackend:
+    """Интерфейс поискового индекса постов и комментариев."""
+
+    def index_post(self, post):
+        raise NotImplementedError
+
+    def index_comment(self, comment):
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        raise NotImplementedError
+
+    def remove_comment(self, comment_id):
+        raise NotImplementedError
+
+    def remove_comments(self, comment_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, query, limit, offset=0):
+        """Id постов по убыванию релевантности."""
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Поиск через LIKE по основам слов, без отдельного индекса."""
+
+    def index_post(self, post):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def remove_comments(self, comment_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit, offset=0):
+        terms = stems(query)
+        if not terms:
+            return []
+        posts = Post.objects.all()
+        for term in terms:
+            matched = Comment.objects.filter(
+                text__icontains=term).values('post_id')
+            posts = posts.filter(
+                Q(text__icontains=term) | Q(pk__in=matched))
+        return list(posts.order_by('-pub_date', '-id').values_list(
+            'id', flat=True)[offset:offset + limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Инвертированный индекс SQLite FTS5 по основам слов.
+
+    В индексе хранится текст, пропущенный через русский стеммер, а
+    rowid кодирует вид и id объекта, поэтому обновление записи - это
+    поиск по первичному ключу, а не просмотр таблицы.
+    """
+
+    table = 'posts_search'
+    comment_weight = 0.5
+    batch_size = 500
+
+    @staticmethod
+    def rowid(kind, pk):
+        return pk * 2 + (kind == 'comment')
+
+    @staticmethod
+    def body(text):
+        return ' '.join(stems(text))
+
+    def _replace(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, body, kind, post_id) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def _remove(self, rowids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(rowid,) for rowid in rowids],
+            )
+
+    def index_post(self, post):
+        self._replace([(
+            self.rowid('post', post.pk), self.body(post.text), 'post', post.pk
+        )])
+
+    def index_comment(self, comment):
+        self._replace([(
+            self.rowid('comment', comment.pk),
+            self.body(comment.text),
+            'comment',
+            comment.post_id,
+        )])
+
+    def remove_post(self, post_id):
+        self._remove([self.rowid('post', post_id)])
+
+    def remove_comment(self, comment_id):
+        self.remove_comments([comment_id])
+
+    def remove_comments(self, comment_ids):
+        if comment_ids:
+            self._remove([self.rowid('comment', pk) for pk in comment_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        sources = (
+            ('post', Post.objects.values_list('id', 'text', 'id')),
+            ('comment', Comment.objects.values_list('id', 'text', 'post_id')),
+        )
+        for kind, rows in sources:
+            batch = []
+            for pk, text, post_id in rows.iterator():
+                batch.append(
+                    (self.rowid(kind, pk), self.body(text), kind, post_id)
+                )
+                if len(batch) >= self.batch_size:
+                    self._replace(batch)
+                    batch = []
+            if batch:
+                self._replace(batch)
+
+    def search(self, query, limit, offset=0):
+        terms = stems(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, MIN(score) AS rank FROM ('
+                f'  SELECT post_id, bm25({self.table}) * CASE kind'
+                f"    WHEN 'post' THEN 1.0 ELSE %s END AS score"
+                f'  FROM {self.table} WHERE {self.table} MATCH %s'
+                # LIMIT -1 не даёт SQLite развернуть подзапрос: bm25()
+                # нельзя вызывать внутри агрегата.
+                f'  LIMIT -1'
+                f') GROUP BY post_id ORDER BY rank LIMIT %s OFFSET %s',
+                [self.comment_weight, match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
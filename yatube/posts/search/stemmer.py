@@ -0,0 +1,67 @@
+"""Стеммер Портера (Snowball) для русского языка."""
+import re
+
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|'
+    r'ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+DERIVATIONAL = re.compile(rf'.*[^{VOWELS}]+[{VOWELS}].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+RV = re.compile(rf'^(.*?[{VOWELS}])(.*)$')
+CYRILLIC = re.compile(r'^[а-я]+$')
+WORD = re.compile(r'\w+')
+
+
+def stem(word):
+    """Основа слова; не русские слова возвращаются в нижнем регистре."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if not CYRILLIC.match(word) or not match:
+        return word
+    start, rv = match.groups()
+
+    cut = PERFECTIVE_GERUND.sub('', rv, 1)
+    if cut == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        cut = ADJECTIVE.sub('', rv, 1)
+        if cut != rv:
+            rv = PARTICIPLE.sub('', cut, 1)
+        else:
+            cut = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if cut == rv else cut
+    else:
+        rv = cut
+
+    rv = re.sub('и$', '', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+
+    cut = re.sub('ь$', '', rv, 1)
+    if cut == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub('нн$', 'н', rv, 1)
+    else:
+        rv = cut
+    return start + rv
+
+
+def stems(text):
+    return [stem(word) for word in WORD.findall(text)]
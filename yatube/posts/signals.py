@@ -0,0 +1,159 @@
+import threading
+
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import caching, counters, tasks, timeline
+from .search import get_backend
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+_state = threading.local()
+
+
+def _is_login_update(update_fields):
+    return bool(update_fields) and set(update_fields) == {'last_login'}
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    instance._old_group_id = Post.objects.filter(pk=instance.pk).values_list(
+        'group_id', flat=True
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, posts_count=1)
+        tasks.fan_out_post.delay(instance.pk)
+    else:
+        caching.bump_version('post', instance.pk)
+    get_backend().index_post(instance)
+    caching.bump_pages(
+        group_ids=[instance.group_id, instance._old_group_id],
+        user_ids=[instance.author_id],
+    )
+
+
+def _deleting_posts():
+    """id постов, которые сейчас удаляются в этом потоке."""
+    if not hasattr(_state, 'deleting_posts'):
+        _state.deleting_posts = set()
+    return _state.deleting_posts
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_comments(sender, instance, **kwargs):
+    # Комментарии удаляются каскадом вместе с постом; их сигналы
+    # пропускают работу, которую post_deleted делает один раз за пост.
+    instance._comment_ids = list(
+        instance.comments.values_list('pk', flat=True)
+    )
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    counters.change_user_stats(instance.author_id, posts_count=-1)
+    get_backend().remove_post(instance.pk)
+    get_backend().remove_comments(getattr(instance, '_comment_ids', []))
+    caching.bump_pages(
+        group_ids=[instance.group_id], user_ids=[instance.author_id]
+    )
+
+
+def _bump_comment_pages(comment):
+    caching.bump_version('post', comment.post_id)
+    post = Post.objects.filter(pk=comment.post_id).values_list(
+        'group_id', 'author_id'
+    ).first()
+    if post is not None:
+        group_id, author_id = post
+        caching.bump_pages(group_ids=[group_id], user_ids=[author_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+    get_backend().index_comment(instance)
+    _bump_comment_pages(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    counters.change_comments_count(instance.post_id, -1)
+    get_backend().remove_comment(instance.pk)
+    _bump_comment_pages(instance)
+
+
+def _bump_follow_pages(follow):
+    # Профиль показывает и число подписчиков автора, и число подписок
+    # подписчика.
+    caching.bump_version('profile_page', follow.author.username)
+    caching.bump_version('profile_page', follow.user.username)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user_stats(instance.author_id, followers_count=1)
+        counters.change_user_stats(instance.user_id, following_count=1)
+        timeline.promote(instance.author_id)
+        timeline.backfill(instance.user, instance.author)
+    _bump_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, followers_count=-1)
+    counters.change_user_stats(instance.user_id, following_count=-1)
+    timeline.prune(instance.user, instance.author)
+    if timeline.should_demote(instance.author_id):
+        tasks.demote_author.delay(instance.author_id)
+    _bump_follow_pages(instance)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._old_slug = Group.objects.filter(pk=instance.pk).values_list(
+        'slug', flat=True
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.bump_version('group', instance.pk)
+    caching.bump_version('group_page', instance.slug)
+    if getattr(instance, '_old_slug', None):
+        caching.bump_version('group_page', instance._old_slug)
+    caching.bump_group_pages(instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    instance._old_username = None
+    if instance.pk and not _is_login_update(update_fields):
+        instance._old_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+        return
+    if _is_login_update(update_fields):
+        return
+    caching.bump_version('user', instance.pk)
+    caching.bump_user_pages(instance)
+    if instance._old_username:
+        caching.bump_version('profile_page', instance._old_username)
@@ -0,0 +1,41 @@
+from tasks.queue import task
+
+from . import images, timeline
+from .caching import render_cards
+from .models import Post
+
+
+@task()
+def generate_image_variants(post_id):
+    images.generate_variants(post_id)
+
+
+def queue_stale_variants() -> int:
+    """Ставит в очередь копии картинок постов, у которых их нет.
+
+    Посты из админки, импорта, seed и старые посты сохранены в обход
+    представлений, которые ставят эту задачу.
+    """
+    count = 0
+    for post_id in images.stale_variant_ids():
+        generate_image_variants.delay(post_id)
+        count += 1
+    return count
+
+
+@task()
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task()
+def demote_author(author_id):
+    timeline.demote(author_id)
+
+
+@task()
+def warm_post_card(post_id):
+    render_cards(Post.objects.select_related('author', 'group').filter(
+        pk=post_id))
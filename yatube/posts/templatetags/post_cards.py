@@ -0,0 +1,11 @@
+from django import template
+
+from posts.caching import render_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts) -> list:
+    return render_cards(posts)
@@ -0,0 +1,259 @@
+"""Бюджеты SQL-запросов и задержки для каждого URL проекта.
+
+Бюджеты хранятся в budgets.json рядом с тестом. Пересчитать их после
+осознанного изменения можно так:
+
+    PERF_UPDATE_BASELINE=1 python manage.py test posts.tests.test_budgets
+
+Размер тестовых данных задаёт PERF_SCALE, число замеров - PERF_RUNS.
+На машине медленнее той, где сняты бюджеты, задержки можно сравнивать с
+бюджетом, умноженным на PERF_LATENCY_SLACK.
+"""
+import gc
+import json
+import math
+import os
+import random
+import time
+from pathlib import Path
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.urls.resolvers import URLResolver
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts import timeline
+from posts.counters import reconcile
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import get_backend
+
+
+BUDGETS_FILE = Path(__file__).with_name('budgets.json')
+NAMESPACES = ('posts', 'users', 'about')
+SCALE = int(os.getenv('PERF_SCALE', 1))
+RUNS = int(os.getenv('PERF_RUNS', 5))
+UPDATE_BASELINE = os.getenv('PERF_UPDATE_BASELINE') == '1'
+# Бюджет задержки - замер с запасом на шум; пол нужен страницам, которые
+# отвечают быстрее миллисекунды
+LATENCY_HEADROOM = 3
+MIN_LATENCY_MS = 5
+# Множитель бюджетов задержки для медленных машин (CI под нагрузкой)
+LATENCY_SLACK = float(os.getenv('PERF_LATENCY_SLACK', 1))
+USERS = 200 * SCALE
+GROUPS = 20 * SCALE
+POSTS = 5000 * SCALE
+COMMENTS = 2000 * SCALE
+# Комментарии к измеряемому посту: больше одной страницы
+POST_COMMENTS = 100
+FOLLOWS = 50
+
+
+def url_names():
+    """Имена всех URL из posts/urls.py, users/urls.py и about/urls.py."""
+    names = set()
+    for pattern in get_resolver().url_patterns:
+        if isinstance(pattern, URLResolver) and (
+                pattern.namespace in NAMESPACES):
+            names.update(
+                f'{pattern.namespace}:{child.name}'
+                for child in pattern.url_patterns
+            )
+    return names
+
+
+def p95(timings):
+    ordered = sorted(timings)
+    return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+
+class ViewBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        fake = Faker('ru_RU')
+        fake.seed_instance(SCALE)
+        rnd = random.Random(SCALE)
+        cls.author = mixer.blend(User, username='author')
+        cls.reader = mixer.blend(User, username='reader')
+        users = [cls.author] + mixer.cycle(USERS).blend(User)
+        groups = mixer.cycle(GROUPS).blend(Group)
+        Post.objects.bulk_create(
+            [
+                Post(
+                    author=rnd.choice(users),
+                    group=rnd.choice(groups + [None]),
+                    text=fake.paragraph(nb_sentences=8),
+                )
+                for _ in range(POSTS)
+            ],
+            batch_size=500,
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=groups[0], text=fake.paragraph())
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        sentences = [fake.sentence() for _ in range(100)]
+        Comment.objects.bulk_create(
+            [
+                Comment(
+                    post_id=rnd.choice(post_ids),
+                    author=rnd.choice(users),
+                    text=rnd.choice(sentences),
+                )
+                for _ in range(COMMENTS)
+            ] + [
+                Comment(
+                    post=cls.post,
+                    author=rnd.choice(users),
+                    text=rnd.choice(sentences),
+                )
+                for _ in range(POST_COMMENTS)
+            ],
+            batch_size=500,
+        )
+        cls.group = groups[0]
+        Follow.objects.bulk_create(
+            [Follow(user=cls.reader, author=author)
+             for author in users[:FOLLOWS]]
+            + [Follow(user=user, author=cls.author) for user in users[1:]]
+        )
+        reconcile()
+        get_backend().rebuild()
+        timeline.rebuild()
+
+    @classmethod
+    def routes(cls):
+        """Имя URL -> (адрес, пользователь, подготовка перед запросом,
+        данные POST-запроса или None для GET)."""
+        post, author, reader = cls.post, cls.author, cls.reader
+
+        def follow():
+            Follow.objects.get_or_create(user=reader, author=author)
+
+        def unfollow():
+            Follow.objects.filter(user=reader, author=author).delete()
+
+        reset = reverse('users:password_reset_confirm', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+            'token': default_token_generator.make_token(reader),
+        })
+        return {
+            'posts:index': (reverse('posts:index'), None, None, None),
+            'posts:group_list': (
+                reverse('posts:group_list', args=(cls.group.slug,)),
+                None, None, None),
+            'posts:profile': (
+                reverse('posts:profile', args=(author.username,)),
+                reader, None, None),
+            'posts:post_detail': (
+                reverse('posts:post_detail', args=(post.pk,)),
+                reader, None, None),
+            'posts:post_create': (
+                reverse('posts:post_create'), author, None,
+                {'text': 'Новый пост', 'group': cls.group.pk}),
+            'posts:post_edit': (
+                reverse('posts:post_edit', args=(post.pk,)),
+                author, None, None),
+            'posts:post_comments': (
+                reverse('posts:post_comments', args=(post.pk,)),
+                None, None, None),
+            'posts:add_comment': (
+                reverse('posts:add_comment', args=(post.pk,)), reader, None,
+                {'text': 'Новый комментарий'}),
+            'posts:follow_index': (
+                reverse('posts:follow_index'), reader, None, None),
+            'posts:search': (
+                reverse('posts:search') + '?q=солнце', None, None, None),
+            'posts:profile_follow': (
+                reverse('posts:profile_follow', args=(author.username,)),
+                reader, unfollow, None),
+            'posts:profile_unfollow': (
+                reverse('posts:profile_unfollow', args=(author.username,)),
+                reader, follow, None),
+            'users:logout': (reverse('users:logout'), reader, None, None),
+            'users:signup': (reverse('users:signup'), None, None, None),
+            'users:login': (reverse('users:login'), None, None, None),
+            'users:password_change': (
+                reverse('users:password_change'), reader, None, None),
+            'users:password_change_done': (
+                reverse('users:password_change_done'), reader, None, None),
+            'users:password_reset': (
+                reverse('users:password_reset'), None, None, None),
+            'users:password_reset_done': (
+                reverse('users:password_reset_done'), None, None, None),
+            'users:password_reset_confirm': (reset, None, None, None),
+            'users:password_reset_complete': (
+                reverse('users:password_reset_complete'), None, None, None),
+            'about:author': (reverse('about:author'), None, None, None),
+            'about:tech': (reverse('about:tech'), None, None, None),
+        }
+
+    def measure(self, url, user, prepare, data):
+        """Число запросов и p95 задержки холодного запроса, мс.
+
+        Первый запрос не замеряется по времени: он платит за импорт
+        модулей и разбор шаблонов, которые живой процесс делает один раз.
+        Сборка мусора после заполнения базы тоже идёт до замеров.
+        """
+        gc.collect()
+        timings = []
+        queries = 0
+        for run in range(RUNS + 1):
+            cache.clear()
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            if prepare is not None:
+                prepare()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                if data is None:
+                    response = client.get(url)
+                else:
+                    response = client.post(url, data)
+                elapsed = (time.perf_counter() - start) * 1000
+            if run:
+                timings.append(elapsed)
+            self.assertLess(response.status_code, 500, url)
+            queries = max(queries, len(context))
+        return queries, p95(timings)
+
+    def test_every_url_has_budget(self):
+        """Для каждого URL проекта задан бюджет"""
+        self.assertEqual(set(self.routes()), url_names())
+        if not UPDATE_BASELINE:
+            budgets = json.loads(BUDGETS_FILE.read_text())
+            self.assertEqual(set(budgets), url_names())
+
+    def test_views_fit_budgets(self):
+        """Страницы укладываются в бюджет запросов и задержки"""
+        budgets = {}
+        if BUDGETS_FILE.exists():
+            budgets = json.loads(BUDGETS_FILE.read_text())
+        measured = {}
+        for name, route in sorted(self.routes().items()):
+            queries, latency = self.measure(*route)
+            measured[name] = {
+                'queries': queries,
+                'p95_ms': math.ceil(
+                    max(latency * LATENCY_HEADROOM, MIN_LATENCY_MS)),
+            }
+            if UPDATE_BASELINE:
+                continue
+            with self.subTest(url=name):
+                budget = budgets.get(name)
+                self.assertIsNotNone(budget, f'Нет бюджета для "{name}"')
+                self.assertLessEqual(
+                    queries, budget['queries'],
+                    f'"{name}": SQL-запросов больше бюджета')
+                self.assertLessEqual(
+                    latency, budget['p95_ms'] * LATENCY_SLACK,
+                    f'"{name}": p95 задержки выше бюджета')
+        if UPDATE_BASELINE:
+            BUDGETS_FILE.write_text(
+                json.dumps(measured, indent=2, sort_keys=True) + '\n')
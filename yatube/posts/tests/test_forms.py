@@ -1,4 +1,6 @@
 from http import HTTPStatus
+from io import BytesIO
+import os
 import shutil
 import tempfile
 
@@ -7,6 +9,7 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, override_settings, TestCase
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Comment, Group, Post, User
 
@@ -66,10 +69,65 @@ class PostsCreateFormTests(TestCase):
         self.assertTrue(
             Post.objects.filter(
                 text="Тестовый пост",
-                image='posts/small.gif'
+                image='posts/small.gif',
+                image_width=2,
+                image_height=1,
             ).exists())
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
+    def upload(self, name, content, content_type='image/gif'):
+        return self.auth_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': name,
+                'image': SimpleUploadedFile(
+                    name=name, content=content, content_type=content_type
+                ),
+            },
+        )
+
+    def test_same_image_stored_once(self):
+        """Одинаковая картинка второй раз не сохраняется"""
+        image = BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(image, 'PNG')
+        self.upload('first.png', image.getvalue(), 'image/png')
+        self.upload('second.png', image.getvalue(), 'image/png')
+        first = Post.objects.get(text='first.png')
+        second = Post.objects.get(text='second.png')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_hash, first.image_hash)
+        self.assertFalse(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, 'posts', 'second.png')
+        ))
+
+    @override_settings(IMAGE_MASTER_SIZE=40)
+    def test_upload_downscaled_rotated_without_exif(self):
+        """Загрузка уменьшается, поворачивается по EXIF и теряет EXIF"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x0110] = 'Camera'
+        image = BytesIO()
+        Image.new('RGB', (100, 50), 'blue').save(image, 'JPEG', exif=exif)
+        self.upload('photo.jpeg', image.getvalue(), 'image/jpeg')
+        post = Post.objects.get(text='photo.jpeg')
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        self.assertEqual((post.image_width, post.image_height), (20, 40))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS не принимается"""
+        posts_count = Post.objects.count()
+        image = BytesIO()
+        Image.new('RGB', (20, 10)).save(image, 'PNG')
+        response = self.upload('big.png', image.getvalue(), 'image/png')
+        self.assertEqual(Post.objects.count(), posts_count)
+        self.assertTrue(
+            response.context['form'].has_error('image', 'too_many_pixels')
+        )
+
     def test_edit_post_form_valid(self):
         """При отправке валидной формы редактируется запись"""
         posts_count = Post.objects.count()
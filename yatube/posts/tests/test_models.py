@@ -1,6 +1,22 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-from ..models import Group, Post, User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import transfer
+from ..models import (
+    Comment, Follow, Group, ImportedPost, Post, TimelineEntry, User,
+    UserStats
+)
 from yatube.settings import LEN_LIMIT
 
 
@@ -65,3 +81,256 @@ class PostModelTest(TestCase):
             'Поле для основного текстового содержания поста',
             'Проблема с help_text модели Post'
         )
+
+
+class CountersTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_create_and_delete(self):
+        """Счётчики меняются при создании и удалении объектов"""
+        Post.objects.create(author=self.author, text='Второй пост')
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_post_delete_cost_does_not_grow_with_comments(self):
+        """Удаление поста не тратит запросы на каждый его комментарий"""
+        def delete_cost(comments):
+            post = Post.objects.create(author=self.author, text='Пост')
+            Comment.objects.bulk_create([
+                Comment(post=post, author=self.reader, text='Комментарий')
+                for _ in range(comments)
+            ])
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            return len(context)
+
+        self.assertEqual(delete_cost(1), delete_cost(5))
+        self.assertFalse(Comment.objects.exists())
+
+    def test_reconcile_counters_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения"""
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=3)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+
+class QueryPlansTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=self.user, author=reader)
+        for number in range(3):
+            post = Post.objects.create(
+                author=reader, group=group, text=f'Пост {number}'
+            )
+            Comment.objects.create(post=post, author=self.user, text='Да')
+        Post.objects.create(author=self.user, group=group, text='Мой пост')
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы страниц постов не просматривают таблицы целиком"""
+        out = StringIO()
+        call_command('explain_queries', '--all-plans', stdout=out)
+        self.assertIn('Полных просмотров таблиц нет', out.getvalue())
+
+    def test_explain_queries_rolls_back_writes(self):
+        """Проверка планов не оставляет в базе вход и сессию автора"""
+        call_command('explain_queries', stdout=StringIO())
+        self.assertFalse(Session.objects.exists())
+        post = Post.objects.filter(group__isnull=False).first()
+        post.author.refresh_from_db()
+        self.assertIsNone(post.author.last_login)
+
+
+class ContentTransferTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'content.ndjson')
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super().tearDown()
+
+    def export(self, *args):
+        call_command(
+            'export_content', self.path, *args, stdout=StringIO()
+        )
+
+    def import_(self, *args):
+        call_command(
+            'import_content', self.path, *args, stdout=StringIO()
+        )
+
+    def test_round_trip_keeps_content_and_dates(self):
+        """Выгруженные записи загружаются заново с исходными датами"""
+        self.export('--chunk-size', '2')
+        pub_dates = dict(Post.objects.values_list('id', 'pub_date'))
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+        User.objects.exclude(pk=self.author.pk).delete()
+        self.import_('--chunk-size', '2')
+        self.assertEqual(
+            dict(Post.objects.values_list('id', 'pub_date')), pub_dates
+        )
+        self.assertEqual(Group.objects.get().slug, 'group')
+        self.assertEqual(Comment.objects.get().author.username, 'reader')
+        follow = Follow.objects.get()
+        self.assertEqual(follow.author, self.author)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user).count(), 5
+        )
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
+
+    def test_taken_ids_get_new_ones(self):
+        """Посты с занятым id получают новый, комментарии идут за ними"""
+        self.export()
+        ids = [post.pk for post in self.posts]
+        Post.objects.filter(pk__in=ids).delete()
+        others = [
+            Post.objects.create(id=pk, author=self.reader, text='Чужой')
+            for pk in ids
+        ]
+        self.import_()
+        self.import_()
+        kept = Post.objects.filter(pk__in=ids)
+        self.assertEqual(set(kept.values_list('text', flat=True)), {'Чужой'})
+        imported = Post.objects.exclude(pk__in=ids)
+        self.assertEqual(
+            sorted(imported.values_list('text', flat=True)),
+            [f'Пост {number}' for number in range(5)],
+        )
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Пост 0')
+        self.assertNotIn(comment.post, others)
+        self.assertFalse(ImportedPost.objects.exists())
+
+    def test_new_ids_kept_across_resume(self):
+        """Новые id постов переживают перезапуск, а точка хранит только
+        смещение и счётчики"""
+        self.export()
+        ids = [post.pk for post in self.posts]
+        Post.objects.filter(pk__in=ids).delete()
+        for pk in ids:
+            Post.objects.create(id=pk, author=self.reader, text='Чужой')
+
+        def interrupted(rows, source):
+            raise KeyboardInterrupt
+
+        with mock.patch.dict(transfer.LOADERS, comment=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.import_()
+        with open(f'{self.path}.checkpoint') as file:
+            checkpoint = json.load(file)
+        self.assertEqual(set(checkpoint), {'offset', 'total', 'notes'})
+        self.assertEqual(checkpoint['notes'], {'renumbered_posts': 5})
+        self.import_('--resume')
+        self.assertEqual(Comment.objects.get().post.text, 'Пост 0')
+
+    def test_import_resumes_from_checkpoint(self):
+        """Загрузка продолжается с контрольной точки"""
+        self.export()
+        with open(self.path, 'rb') as file:
+            lines = file.readlines()
+        Post.objects.filter(pk__in=[post.pk for post in self.posts]).delete()
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({'offset': sum(map(len, lines[:3]))}, file)
+        self.import_('--resume')
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {f'Пост {number}' for number in range(2, 5)},
+        )
+
+
+class SeedCommandTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.media, ignore_errors=True)
+        super().tearDown()
+
+    def seed(self, prefix, *args):
+        with override_settings(MEDIA_ROOT=self.media):
+            call_command(
+                'seed', '--prefix', prefix, '--users', '20',
+                '--groups', '3', '--posts', '200', '--comments', '50',
+                '--follows', '4', '--batch-size', '64', *args,
+                stdout=StringIO(),
+            )
+
+    def test_seed_creates_dataset(self):
+        """seed создаёт заданное число записей и пересчитывает счётчики"""
+        self.seed('first', '--images', '0.5')
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(os.listdir(os.path.join(self.media, 'posts')))
+        stats = UserStats.objects.order_by('-posts_count')
+        self.assertEqual(sum(s.posts_count for s in stats), 200)
+        self.assertGreater(stats[0].posts_count, stats[10].posts_count)
+        self.assertEqual(
+            sum(s.followers_count for s in stats), Follow.objects.count()
+        )
+
+    def test_seed_is_reproducible(self):
+        """Одинаковый --seed даёт одинаковые данные"""
+        self.seed('first', '--images', '0')
+        self.seed('second', '--images', '0')
+        first, second = (
+            list(Post.objects.filter(
+                author__username__startswith=f'{prefix}_'
+            ).order_by('pk').values_list('text', 'pub_date'))
+            for prefix in ('first', 'second')
+        )
+        self.assertEqual(first, second)
+
+    def test_seed_refuses_existing_prefix(self):
+        """Повторный запуск с тем же префиксом не дублирует данные"""
+        self.seed('first', '--images', '0', '--skip-refresh')
+        with self.assertRaises(CommandError):
+            self.seed('first', '--images', '0')
@@ -1,3 +1,6 @@
+from io import BytesIO, StringIO
+import base64
+import json
 import shutil
 import tempfile
 
@@ -5,10 +8,15 @@ from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, override_settings, TestCase
 from django.urls import reverse
+from PIL import Image
 
-from posts.models import Follow, Group, Post, User
+from posts import images, tasks, timeline
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User
+)
 
 
 POSTS_COUNT = 15
@@ -280,11 +288,41 @@ class PostsPagesTests(TestCase):
         """Проверка кэширования страницы INDEX"""
         response1 = self.authorized_client.get(reverse('posts:index'))
         content_before = response1.content
-        Post.objects.get(pk=1).delete()
+        Post.objects.filter(pk=self.post_pk).update(text='Правка без сигналов')
         response2 = self.authorized_client.get(reverse('posts:index'))
         content_after = response2.content
         self.assertEqual(content_before, content_after)
 
+    def test_cache_index_page_reset_on_delete(self):
+        """Удаление поста сбрасывает кэш страницы INDEX"""
+        response1 = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.get(pk=self.post_pk).delete()
+        response2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response1.content, response2.content)
+        self.assertNotIn(self.post, response2.context['page_obj'])
+
+    def test_cached_pages_reset_on_group_and_comment(self):
+        """Изменения группы и комментариев сбрасывают кэш страниц"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.slug}),
+            reverse('posts:profile', kwargs={'username': self.username}),
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        changes = (
+            lambda: Group.objects.get(pk=self.group.pk).save(),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.f_user, text='Комментарий'),
+        )
+        for change in changes:
+            change()
+            for page in pages:
+                with self.subTest(page=page):
+                    response = self.authorized_client.get(page)
+                    self.assertIsNotNone(
+                        response.context, f'"{page}" отдан из кэша')
+
     def test_follow_unfollow_auth_user(self):
         """Проверка подписки/отписки на автора"""
         def response():
@@ -353,3 +391,472 @@ class PaginatorViewsTest(TestCase):
         response = self.auth_client.get(reverse('posts:index') + '?page=2')
         diff_count = len(Post.objects.all()) - PAG_LIMIT
         self.assertEqual(len(response.context['page_obj']), diff_count)
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Токены следующей и предыдущей страниц обходят всю ленту"""
+        first = self.auth_client.get(reverse('posts:index')).context[
+            'page_obj']
+        self.assertFalse(first.has_previous())
+        second = self.auth_client.get(
+            reverse('posts:index'), {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertFalse(second.has_next())
+        self.assertEqual(len(second), POSTS_COUNT - PAG_LIMIT)
+        self.assertEqual(
+            list(first) + list(second), list(Post.objects.order_by(
+                '-pub_date', '-id'))
+        )
+        back = self.auth_client.get(
+            reverse('posts:index'), {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_last_page_cursor(self):
+        """Токен последней страницы показывает самые старые записи"""
+        first = self.auth_client.get(reverse('posts:index')).context[
+            'page_obj']
+        last = self.auth_client.get(
+            reverse('posts:index'), {'cursor': first.last_cursor}
+        ).context['page_obj']
+        self.assertTrue(last.has_previous())
+        self.assertFalse(last.has_next())
+        self.assertEqual(
+            list(last), list(Post.objects.order_by('-pub_date', '-id'))[
+                -PAG_LIMIT:]
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный токен открывает первую страницу"""
+        response = self.auth_client.get(
+            reverse('posts:index'), {'cursor': 'не-токен'}
+        )
+        self.assertEqual(len(response.context['page_obj']), PAG_LIMIT)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_tampered_cursor_values_return_first_page(self):
+        """Токен с неверными значениями ключа открывает первую страницу"""
+        for values in (
+            ['2020-13-01T00:00:00', 1],
+            ['2020-01-01T00:00:00', 'abc'],
+            ['2020-01-01T00:00:00', {}],
+            [{}, 1],
+        ):
+            raw = json.dumps(['n', values]).encode()
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            with self.subTest(values=values):
+                response = self.auth_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']), PAG_LIMIT
+                )
+
+    def test_page_does_not_count_posts(self):
+        """Страница ленты не выполняет COUNT по таблице постов"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts:index'))
+
+
+@override_settings(TASKS_EAGER=True)
+class TimelineViewsTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        return self.reader_client.get(
+            reverse('posts:follow_index')).context['page_obj']
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(list(self.feed()), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает её"""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        self.assertEqual(list(self.feed()), posts[::-1])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,)))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(len(self.feed()), 0)
+
+    def test_follow_refreshes_follower_profile(self):
+        """Подписка обновляет закэшированный профиль подписчика"""
+        url = reverse('posts:profile', args=(self.reader.username,))
+        self.assertContains(self.reader_client.get(url), 'подписок: 0')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        self.assertContains(self.reader_client.get(url), 'подписок: 1')
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_read_on_demand(self):
+        """Посты популярного автора читаются без раскладки по лентам"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=other)
+        other_post = Post.objects.create(author=other, text='Пост звезды')
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(self.feed()), [post, other_post])
+
+    def test_post_in_feed_before_fan_out(self):
+        """Пост виден подписчику, пока раскладка ждёт обработчика задач"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with override_settings(TASKS_EAGER=False):
+            post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(self.feed()), [post])
+        tasks.fan_out_post(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(post.fanned_out)
+        self.assertEqual(list(self.feed()), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=3, TIMELINE_FANOUT_RELEASE=0.7)
+    def test_posts_kept_when_author_drops_below_limit(self):
+        """Посты, вышедшие под чтением на лету, остаются в лентах"""
+        others = [
+            User.objects.create_user(username=f'other{i}') for i in range(2)
+        ]
+        for user in others + [self.reader]:
+            Follow.objects.create(user=user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Под флагом')
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=others[0]).delete()
+        self.assertTrue(timeline.is_celebrity(self.author.pk))
+        self.assertEqual(list(self.feed()), [post])
+        Follow.objects.filter(user=others[1]).delete()
+        self.assertFalse(timeline.is_celebrity(self.author.pk))
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(list(self.feed()), [post])
+
+
+class PostCommentsViewsTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=User.objects.create_user(
+                username=f'reader{number}'), text=f'Комментарий {number}')
+            for number in range(settings.COMMENTS_COUNT + 5)
+        ])
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Число запросов к базе не зависит от числа комментариев"""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            len(response.context['comment_obj']), settings.COMMENTS_COUNT
+        )
+
+    def test_load_more_returns_remaining_comments(self):
+        """«Показать ещё» отдаёт оставшиеся комментарии без повторов"""
+        first = self.client.get(self.url).context['comment_obj']
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': first.next_cursor},
+        )
+        rest = response.context['comment_obj']
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(rest.has_next())
+        self.assertEqual(
+            {comment.pk for comment in first} | {
+                comment.pk for comment in rest},
+            set(self.post.comments.values_list('pk', flat=True)),
+        )
+
+
+class ConditionalResponsesTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.index_url = reverse('posts:index')
+        self.detail_url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'], **headers
+        )
+
+    def test_unchanged_feed_not_modified_without_queries(self):
+        """Неизменившаяся лента отвечает 304 без обращений к базе"""
+        response = self.client.get(self.index_url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            repeated = self.revalidate(self.index_url, response)
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(repeated['ETag'], response['ETag'])
+        modified = self.client.get(
+            self.index_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(modified.status_code, 304)
+
+    def test_new_post_changes_feed_etag(self):
+        """Новый пост меняет ETag ленты"""
+        response = self.client.get(self.index_url)
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(
+            self.revalidate(self.index_url, response).status_code, 200
+        )
+
+    def test_post_detail_revalidated_by_versions(self):
+        """Страница поста отвечает 304, пока не изменился пост"""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 304
+        )
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 200
+        )
+
+    def test_etag_depends_on_user(self):
+        """Другой пользователь не получает чужую копию страницы"""
+        response = self.client.get(self.detail_url)
+        self.client.force_login(self.user)
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 200
+        )
+
+    def test_comment_author_rename_changes_detail_etag(self):
+        """Переименование автора комментария меняет ETag страницы поста"""
+        reader = User.objects.create_user(username='reader')
+        Comment.objects.create(post=self.post, author=reader, text='Да')
+        response = self.client.get(self.detail_url)
+        reader.first_name = 'Лев'
+        reader.save()
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 200
+        )
+
+    def test_new_login_not_served_stale_csrf_form(self):
+        """После повторного входа страница с формой не отвечает 304"""
+        self.user.set_password('password')
+        self.user.save()
+        credentials = {'username': 'author', 'password': 'password'}
+        self.client.post(reverse('users:login'), credentials)
+        response = self.client.get(self.detail_url)
+        self.client.logout()
+        self.client.post(reverse('users:login'), credentials)
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 200
+        )
+
+
+class PostCardsCacheTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Исходный текст', group=self.group
+        )
+
+    def index_content(self):
+        return self.client.get(reverse('posts:index')).content.decode()
+
+    def test_card_is_served_from_cache(self):
+        """Повторная отрисовка ленты берёт карточку из кэша"""
+        self.index_content()
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertIn('Исходный текст', self.index_content())
+
+    def test_card_version_bumped_on_changes(self):
+        """Правка поста, автора или группы обновляет карточку"""
+        self.index_content()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.index_content())
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertIn('Лев', self.index_content())
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertIn('new-slug', self.index_content())
+
+    def test_group_feed_has_no_link_to_itself(self):
+        """В ленте группы у карточек нет ссылки на эту же группу"""
+        link = 'Все записи группы'
+        self.assertIn(link, self.index_content())
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.group.slug])
+        )
+        self.assertContains(response, 'Исходный текст')
+        self.assertNotContains(response, link)
+        self.assertIn(link, self.index_content())
+
+
+class SearchViewsTest(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.cats = Post.objects.create(
+            author=self.user, text='Наши котики любят спать на диване')
+        self.dogs = Post.objects.create(
+            author=self.user, text='Собака гуляет во дворе')
+        Comment.objects.create(
+            post=self.dogs, author=self.user, text='А где же котик?')
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_uses_russian_stems(self):
+        """Поиск находит другие словоформы и тексты комментариев"""
+        self.assertEqual(self.found('котиков'), [self.cats, self.dogs])
+        self.assertEqual(self.found('собаки'), [self.dogs])
+        self.assertEqual(self.found('жираф'), [])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении постов"""
+        self.cats.text = 'Теперь здесь про жирафов'
+        self.cats.save()
+        self.assertEqual(self.found('жираф'), [self.cats])
+        self.assertEqual(self.found('диван'), [])
+        self.cats.delete()
+        self.assertEqual(self.found('жираф'), [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='variant.gif', content=small_gif,
+                content_type='image/gif'),
+        )
+
+    def test_feed_uses_original_until_variants_ready(self):
+        """До подготовки копий лента показывает исходную картинку"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+
+    def test_feed_variant_built_on_upload(self):
+        """Копия для ленты готова сразу после загрузки, без задачи"""
+        self.client.force_login(self.user)
+        upload = BytesIO()
+        Image.new('RGB', (2000, 1000), 'green').save(upload, 'PNG')
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Большая картинка',
+            'image': SimpleUploadedFile(
+                'big.png', upload.getvalue(), content_type='image/png'
+            ),
+        })
+        post = Post.objects.get(text='Большая картинка')
+        thumb = post.thumbnail
+        self.assertIn('/posts/derived/', thumb['url'])
+        self.assertEqual(
+            (thumb['width'], thumb['height']), images.feed_size()
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, thumb['url'])
+        self.assertNotContains(response, post.image.url + '"')
+        self.assertIn(post.pk, images.stale_variant_ids())
+        images.generate_variants(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail['url'], thumb['url'])
+        self.assertNotIn(post.pk, images.stale_variant_ids())
+
+    def test_generated_variants_used_in_feed(self):
+        """Готовые копии сохраняются в посте и попадают в ленту"""
+        self.client.get(reverse('posts:index'))
+        images.generate_variants(self.post.pk)
+        self.post.refresh_from_db()
+        jpegs = self.post.variants['jpeg']
+        self.assertEqual(
+            [(v['width'], v['height']) for v in jpegs],
+            list(settings.IMAGE_VARIANT_SIZES),
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.thumbnail['url'])
+        self.assertIn('/posts/derived/', self.post.thumbnail['url'])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_stale_variants_queued_by_command(self):
+        """Команда строит копии постов, у которых их нет или они устарели"""
+        self.assertEqual(list(images.stale_variant_ids()), [self.post.pk])
+        call_command('queue_image_variants', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.variants)
+        self.assertEqual(list(images.stale_variant_ids()), [])
+        with override_settings(IMAGE_VARIANT_SIZES=((480, 170),)):
+            self.assertEqual(
+                list(images.stale_variant_ids()), [self.post.pk]
+            )
+
+    def test_variants_shared_by_same_file(self):
+        """Пост с тем же файлом берёт уже готовые копии"""
+        images.generate_variants(self.post.pk)
+        copy = Post.objects.create(
+            author=self.user, text='Копия', image=self.post.image.name
+        )
+        images.generate_variants(copy.pk)
+        self.post.refresh_from_db()
+        copy.refresh_from_db()
+        self.assertEqual(copy.variants, self.post.variants)
+
+    def test_feed_images_responsive_and_lazy(self):
+        """Лента отдаёт srcset всех ширин, размеры и ленивую загрузку"""
+        images.generate_variants(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (2, 1)
+        )
+        thumb = self.post.thumbnail
+        response = self.client.get(reverse('posts:index'))
+        for width, _ in settings.IMAGE_VARIANT_SIZES:
+            self.assertIn(f' {width}w', thumb['srcset'])
+        self.assertContains(response, f'srcset="{thumb["srcset"]}"')
+        self.assertContains(response, f'sizes="{settings.IMAGE_SIZES}"')
+        self.assertContains(
+            response,
+            'width="{}" height="{}" loading="lazy"'.format(
+                *next(
+                    size for size in settings.IMAGE_VARIANT_SIZES
+                    if size[0] == settings.IMAGE_FEED_WIDTH
+                )
+            ),
+        )
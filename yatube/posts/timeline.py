@@ -0,0 +1,181 @@
+"""Материализованная лента подписок.
+
+Посты обычных авторов раскладываются в TimelineEntry подписчиков при
+публикации (fan-out-on-write). Автор, у которого подписчиков стало не
+меньше TIMELINE_FANOUT_LIMIT, получает флаг UserStats.read_on_demand: его
+посты в ленты не раскладываются и читаются при открытии ленты
+(fan-out-on-read). Флаг снимается, только когда подписчиков осталось
+меньше доли TIMELINE_FANOUT_RELEASE от предела, и вместе с этим ленты
+всех подписчиков заполняются постами автора: иначе посты, опубликованные
+под флагом, пропали бы из лент.
+
+Раскладку делает фоновая задача. Пока она не выполнена (или обработчик
+задач не запущен), у поста не стоит Post.fanned_out, и лента читает его
+на лету вместе с постами звёзд.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import KeysetPaginator
+
+
+def is_celebrity(author_id) -> bool:
+    return UserStats.objects.filter(
+        user_id=author_id, read_on_demand=True
+    ).exists()
+
+
+def celebrity_ids(user):
+    """Авторы из подписок пользователя, посты которых читаются на лету."""
+    return list(UserStats.objects.filter(
+        user__following__user=user, read_on_demand=True,
+    ).values_list('user_id', flat=True))
+
+
+def release_limit() -> int:
+    return int(
+        settings.TIMELINE_FANOUT_LIMIT * settings.TIMELINE_FANOUT_RELEASE
+    )
+
+
+def promote(author_id):
+    """Включает чтение на лету, если подписчиков набралось до предела."""
+    UserStats.objects.filter(
+        user_id=author_id,
+        read_on_demand=False,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(read_on_demand=True)
+
+
+def should_demote(author_id) -> bool:
+    return UserStats.objects.filter(
+        user_id=author_id,
+        read_on_demand=True,
+        followers_count__lt=release_limit(),
+    ).exists()
+
+
+def demote(author_id):
+    """Возвращает автора к раскладке и заполняет ленты его подписчиков.
+
+    Флаг и записи лент меняются в одной транзакции, поэтому читатель
+    видит посты автора либо на лету, либо уже в своей ленте.
+    """
+    with transaction.atomic():
+        if not UserStats.objects.filter(
+            user_id=author_id,
+            read_on_demand=True,
+            followers_count__lt=release_limit(),
+        ).update(read_on_demand=False):
+            return
+        posts = list(Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL])
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        for user_id in followers.iterator():
+            _insert([
+                TimelineEntry(user_id=user_id, post_id=post_id,
+                              pub_date=pub_date)
+                for post_id, pub_date in posts
+            ])
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if not is_celebrity(post.author_id):
+        _fan_out(post)
+    Post.objects.filter(pk=post.pk).update(fanned_out=True)
+
+
+def _fan_out(post):
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(TimelineEntry(
+            user_id=user_id, post_id=post.pk, pub_date=post.pub_date
+        ))
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            _insert(batch)
+            batch = []
+    _insert(batch)
+
+
+def backfill(user, author):
+    """Заполняет ленту нового подписчика последними постами автора."""
+    if is_celebrity(author.pk):
+        return
+    posts = author.posts.order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL]
+    _insert([
+        TimelineEntry(user=user, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    ])
+
+
+def rebuild():
+    """Заново заполняет ленты всех читателей по текущим подпискам."""
+    TimelineEntry.objects.all().delete()
+    Post.objects.filter(fanned_out=False).update(fanned_out=True)
+    UserStats.objects.update(read_on_demand=False)
+    UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(read_on_demand=True)
+    follows = Follow.objects.select_related('user', 'author')
+    for follow in follows.iterator():
+        backfill(follow.user, follow.author)
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Лента подписок: слияние материализованной ленты, постов звёзд и
+    ещё не разложенных постов."""
+
+    def __init__(self, user, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page
+        )
+        self.user = user
+
+    def _fetch(self, values, descending, limit, offset=0):
+        entries = self._slice(
+            TimelineEntry.objects.filter(user=self.user),
+            values, descending, offset + limit,
+            keys=('pub_date', 'post_id'),
+        )
+        posts = self.queryset.in_bulk([entry.post_id for entry in entries])
+        celebrities = celebrity_ids(self.user)
+        on_demand = [self.queryset.filter(
+            fanned_out=False, author__following__user=self.user
+        )]
+        if celebrities:
+            on_demand.append(self.queryset.filter(author_id__in=celebrities))
+        for queryset in on_demand:
+            posts.update(
+                (post.pk, post) for post in self._slice(
+                    queryset, values, descending, offset + limit,
+                )
+            )
+        rows = sorted(
+            posts.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=descending,
+        )
+        return rows[offset:offset + limit]
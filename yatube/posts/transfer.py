@@ -0,0 +1,306 @@
+"""Выгрузка и загрузка записей блога в формате NDJSON.
+
+Каждая строка файла - JSON-объект с полем "model". Группы, посты,
+комментарии и подписки выгружаются в этом порядке, чтобы при загрузке
+связанные записи уже существовали. Пользователи передаются по имени,
+группы - по адресу. Посты и комментарии сохраняют свои id, если те
+свободны; такая же запись под тем же id (повторная загрузка файла)
+пропускается, а запись, id которой занят другой, получает новый id.
+Новые id постов хранятся в таблице ImportedPost, пока идёт загрузка
+файла: по ней комментарии находят свои посты, а память и контрольная
+точка не растут вместе с файлом.
+"""
+import datetime
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from . import tasks, timeline
+from .counters import reconcile
+from .models import Comment, Follow, Group, ImportedPost, Post, User
+from .search import get_backend
+
+
+MODELS = ('group', 'post', 'comment', 'follow')
+
+EXPORT_FIELDS = {
+    'group': (Group, {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'post': (Post, {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    }),
+    'comment': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follow': (Follow, {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+class Encoder(DjangoJSONEncoder):
+    """Сохраняет микросекунды, которые DjangoJSONEncoder отбрасывает."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(record) -> bytes:
+    return (json.dumps(record, cls=Encoder, ensure_ascii=False)
+            + '\n').encode()
+
+
+def export_rows(model, after=0, chunk_size=1000):
+    """Записи модели с id больше after, по возрастанию id."""
+    model_class, fields = EXPORT_FIELDS[model]
+    rows = model_class.objects.filter(pk__gt=after).order_by('pk')
+    for values in rows.values_list(*fields.values()).iterator(chunk_size):
+        yield {'model': model, **dict(zip(fields, values))}
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def keep_dates():
+    """Сохраняет даты из файла: auto_now_add заменил бы их текущими."""
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def user_ids(usernames):
+    """id пользователей по именам; недостающие создаются без пароля."""
+    usernames = set(usernames) - {None}
+    found = dict(User.objects.filter(username__in=usernames).values_list(
+        'username', 'id'
+    ))
+    missing = usernames - found.keys()
+    if missing:
+        User.objects.bulk_create(
+            [User(username=name, password=make_password(None))
+             for name in missing],
+            ignore_conflicts=True,
+        )
+        found.update(User.objects.filter(username__in=missing).values_list(
+            'username', 'id'
+        ))
+    return found
+
+
+def insert_keeping_ids(model, objects, identity):
+    """Сохраняет объекты под их id; возвращает ({id из файла: id}, новых).
+
+    Объект, id которого уже занят такой же записью (поля identity
+    совпадают), не сохраняется повторно. Если id занят другой записью,
+    ищется такая же запись под другим id - её оставила прошлая загрузка
+    этого файла; иначе объект получает следующий свободный id.
+    """
+    def key(obj):
+        return tuple(getattr(obj, field) for field in identity)
+
+    existing = {
+        row[0]: row[1:] for row in model.objects.filter(
+            pk__in=[obj.pk for obj in objects]
+        ).values_list('pk', *identity)
+    }
+    ids, fresh, renumbered = {}, [], 0
+    next_id = None
+    for obj in objects:
+        source = obj.pk
+        if source in existing:
+            if existing[source] == key(obj):
+                ids[source] = source
+                continue
+            match = model.objects.filter(
+                **dict(zip(identity, key(obj)))
+            ).values_list('pk', flat=True).first()
+            if match is not None:
+                ids[source] = match
+                continue
+            if next_id is None:
+                next_id = max(
+                    model.objects.aggregate(top=Max('pk'))['top'] or 0,
+                    max(obj.pk for obj in objects),
+                ) + 1
+            obj.pk = next_id
+            next_id += 1
+            renumbered += 1
+        ids[source] = obj.pk
+        fresh.append(obj)
+    model.objects.bulk_create(fresh)
+    return ids, renumbered
+
+
+def load_groups(rows, source):
+    Group.objects.bulk_create(
+        [Group(title=row['title'], slug=row['slug'],
+               description=row['description']) for row in rows],
+        ignore_conflicts=True,
+    )
+    return {}
+
+
+def load_posts(rows, source):
+    users = user_ids(row['author'] for row in rows)
+    groups = dict(Group.objects.filter(
+        slug__in={row['group'] for row in rows}
+    ).values_list('slug', 'id'))
+    ids, renumbered = insert_keeping_ids(
+        Post,
+        [
+            Post(
+                id=row['id'],
+                text=row['text'],
+                pub_date=parse_datetime(row['pub_date']),
+                author_id=users[row['author']],
+                group_id=groups.get(row['group']),
+                image=row['image'] or '',
+            )
+            for row in rows
+        ],
+        ('author_id', 'pub_date', 'text'),
+    )
+    ImportedPost.objects.bulk_create(
+        [
+            ImportedPost(source=source, source_id=source_id, post_id=pk)
+            for source_id, pk in ids.items()
+            if source_id != pk
+        ],
+        ignore_conflicts=True,
+    )
+    return {'renumbered_posts': renumbered}
+
+
+def post_ids(source, ids):
+    """id в базе для id постов из файла; посты, которых нет, пропущены."""
+    moved = dict(ImportedPost.objects.filter(
+        source=source, source_id__in=ids
+    ).values_list('source_id', 'post_id'))
+    found = set(Post.objects.filter(
+        pk__in=[moved.get(pk, pk) for pk in ids]
+    ).values_list('pk', flat=True))
+    return {
+        pk: moved.get(pk, pk) for pk in ids if moved.get(pk, pk) in found
+    }
+
+
+def load_comments(rows, source):
+    users = user_ids(row['author'] for row in rows)
+    posts = post_ids(source, {row['post'] for row in rows})
+    comments = [
+        Comment(
+            id=row['id'],
+            post_id=posts[row['post']],
+            author_id=users[row['author']],
+            text=row['text'],
+            created=parse_datetime(row['created']),
+        )
+        for row in rows
+        if row['post'] in posts
+    ]
+    _, renumbered = insert_keeping_ids(
+        Comment, comments, ('post_id', 'author_id', 'created', 'text')
+    )
+    return {
+        'renumbered_comments': renumbered,
+        'orphan_comments': len(rows) - len(comments),
+    }
+
+
+def load_follows(rows, source):
+    users = user_ids(
+        [row['user'] for row in rows] + [row['author'] for row in rows]
+    )
+    Follow.objects.bulk_create(
+        [
+            Follow(user_id=users[row['user']], author_id=users[row['author']])
+            for row in rows
+            if row['user'] != row['author']
+        ],
+        ignore_conflicts=True,
+    )
+    return {}
+
+
+LOADERS = {
+    'group': load_groups,
+    'post': load_posts,
+    'comment': load_comments,
+    'follow': load_follows,
+}
+
+
+def source_key(path):
+    """Ключ файла загрузки в таблице ImportedPost."""
+    return hashlib.md5(os.path.abspath(path).encode()).hexdigest()
+
+
+def forget_ids(source):
+    ImportedPost.objects.filter(source=source).delete()
+
+
+def load(model, rows, source):
+    """Сохраняет пачку записей одной модели без сигналов.
+
+    source - ключ файла из source_key(). Возвращает счётчики
+    перенумерованных и пропущенных строк.
+    """
+    with keep_dates():
+        return LOADERS[model](rows, source)
+
+
+def refresh():
+    """Пересчитывает то, что при обычном сохранении делают сигналы и
+    представления, и ставит в очередь копии картинок."""
+    with transaction.atomic():
+        reconcile()
+        get_backend().rebuild()
+        timeline.rebuild()
+    cache.clear()
+    tasks.queue_stale_variants()
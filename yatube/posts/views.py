@@ -1,23 +1,31 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from yatube.settings import POSTS_COUNT
 
+from core.routers import replica_reads
 
-CACHE_TIME = 20
+from . import images
+from .caching import (
+    cached_page, fresh_reads, not_modified, page_validators,
+    post_page_items, set_validators
+)
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Group, Post, User
+from .paginators import KeysetPaginator
+from .search import get_backend
+from .tasks import generate_image_variants, warm_post_card
+from .timeline import TimelinePaginator
+from yatube.settings import COMMENTS_COUNT, POSTS_COUNT
 
 
 def paginator(request, queryset):
-    paginator = Paginator(queryset, POSTS_COUNT)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    paginator = KeysetPaginator(queryset, POSTS_COUNT)
+    return paginator.get_page(
+        request.GET.get('cursor'), request.GET.get('page')
+    )
 
 
-#@cache_page(CACHE_TIME, key_prefix='index_page')
+@replica_reads
+@cached_page('index')
 def index(request):
     posts = Post.objects.all().select_related('author', 'group')
     page_obj = paginator(request, posts)
@@ -32,6 +40,8 @@ def index(request):
     return render(request, template, context=context)
 
 
+@replica_reads
+@cached_page('group', 'slug')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     group_posts = group.group_posts.all().select_related('author')
@@ -48,8 +58,12 @@ def group_posts(request, slug):
     return render(request, template, context=context)
 
 
+@replica_reads
+@cached_page('profile', 'username')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     author_posts = author.posts.all().select_related('group')
     page_obj = paginator(request, author_posts)
     following = request.user.is_authenticated and (
@@ -68,19 +82,61 @@ def profile(request, username):
     return render(request, template, context)
 
 
+def comments_page(post_id, cursor=None):
+    """Порция комментариев поста вместе с авторами, новые сверху."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = KeysetPaginator(
+        comments, COMMENTS_COUNT, keys=('created', 'id')
+    )
+    return paginator.get_page(cursor)
+
+
+def get_post(post_id):
+    return get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+
+
+@replica_reads
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comment_form = CommentForm(request.POST or None)
-    comment_obj = post.comments.all()
+    post = get_post(post_id)
+    cursor = request.GET.get('comments')
+    comment_obj = comments_page(post.pk, cursor)
+    etag, modified = page_validators(
+        request, post_page_items(post, comment_obj)
+    )
+    response = not_modified(request, etag, modified)
+    if response is not None:
+        return response
+    # ETag строится по текущим версиям: свежую правку реплика может ещё
+    # не знать, и её копия закрепилась бы у клиента.
+    with fresh_reads(modified) as primary:
+        if primary:
+            post = get_post(post_id)
+            comment_obj = comments_page(post.pk, cursor)
+        comment_form = CommentForm(request.POST or None)
+        context = {
+            'post': post,
+            'head_text': 'Очередной интересный пост',
+            'comment_form': comment_form,
+            'comment_obj': comment_obj,
+            'image_bg': 'img/post-bg.jpg',
+        }
+        template = 'posts/post_detail.html'
+        response = render(request, template, context)
+    return set_validators(request, response, etag, modified)
+
+
+@replica_reads
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
     context = {
-        'post': post,
-        'head_text': 'Очередной интересный пост',
-        'comment_form': comment_form,
-        'comment_obj': comment_obj,
-        'image_bg': 'img/post-bg.jpg',
+        'post_id': post_id,
+        'comment_obj': comments_page(post_id, request.GET.get('cursor')),
     }
-    template = 'posts/post_detail.html'
-    return render(request, template, context)
+    return render(request, 'posts/includes/comments.html', context)
 
 
 @login_required
@@ -97,6 +153,10 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            images.generate_feed_variant(post)
+            generate_image_variants.delay(post.pk)
+        warm_post_card.delay(post.pk)
         return redirect('posts:profile', request.user.username)
     return render(request, template, context=context)
 
@@ -122,6 +182,10 @@ def post_edit(request, post_id):
     }
     if request.method == "POST" and form.is_valid():
         form.save()
+        if post.image and 'image' in form.changed_data:
+            images.generate_feed_variant(post)
+            generate_image_variants.delay(post.pk)
+        warm_post_card.delay(post.pk)
         return redirect('posts:post_detail', post.pk)
     return render(request, template, context=context)
 
@@ -138,13 +202,12 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
-    follower = Follow.objects.filter(user=request.user).values_list(
-        "author_id", flat=True
+    page_obj = TimelinePaginator(request.user, POSTS_COUNT).get_page(
+        request.GET.get('cursor'), request.GET.get('page')
     )
-    fav_posts = Post.objects.filter(author_id__in=follower)
-    page_obj = paginator(request, fav_posts)
     context = {
         'title': 'Избранные посты',
         'head_text': 'Избранное',
@@ -167,3 +230,27 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.get(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
+
+
+@replica_reads
+def search(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        number = 1
+    ids = get_backend().search(
+        query, POSTS_COUNT + 1, (number - 1) * POSTS_COUNT
+    ) if query else []
+    found = Post.objects.select_related('author', 'group').in_bulk(
+        ids[:POSTS_COUNT]
+    )
+    context = {
+        'title': 'Поиск',
+        'head_text': 'Поиск по записям',
+        'query': query,
+        'page_obj': [found[pk] for pk in ids[:POSTS_COUNT] if pk in found],
+        'number': number,
+        'has_next': len(ids) > POSTS_COUNT,
+    }
+    return render(request, 'posts/search.html', context)
@@ -27,3 +27,15 @@ window.addEventListener('DOMContentLoaded', () => {
         scrollPos = currentTop;
     });
 })
+
+document.addEventListener('click', (event) => {
+    const link = event.target.closest('[data-more-comments]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    fetch(link.dataset.url)
+        .then((response) => response.text())
+        .then((html) => link.insertAdjacentHTML('afterend', html))
+        .then(() => link.remove());
+});
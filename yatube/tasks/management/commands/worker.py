@@ -0,0 +1,72 @@
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tasks.queue import claim, execute
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.TASKS_CONCURRENCY,
+            help='Число потоков-обработчиков',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=settings.TASKS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунд',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        poll, once = options['poll'], options['once']
+        self.stdout.write(
+            f'Обработчик {name} запущен, потоков: {options["concurrency"]}')
+        if options['concurrency'] <= 1:
+            try:
+                self.work(f'{name}:0', poll, once)
+            except KeyboardInterrupt:
+                pass
+            self.stdout.write(self.style.SUCCESS('Обработчик остановлен'))
+            return
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{name}:{number}', poll, once),
+                daemon=True,
+            )
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS('Обработчик остановлен'))
+
+    def work(self, worker, poll, once):
+        while not self.stop.is_set():
+            close_old_connections()
+            item = claim(worker)
+            if item is None:
+                if once:
+                    break
+                self.stop.wait(poll)
+                continue
+            execute(item)
+        close_old_connections()
@@ -0,0 +1,106 @@
+"""Очередь фоновых задач в базе данных проекта.
+
+Функция, помеченная @task, получает метод delay(): он записывает вызов в
+таблицу Task в той же транзакции, что и данные запроса, а команда
+``manage.py worker`` выполняет записи с повторами при ошибках.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(max_attempts=None):
+    """Регистрирует функцию как фоновую задачу."""
+    def decorator(func):
+        name = f'{func.__module__}.{func.__name__}'
+        _registry[name] = func
+
+        def delay(*args, **kwargs):
+            return enqueue(name, args, kwargs, max_attempts)
+        func.delay = delay
+        func.task_name = name
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=None):
+    kwargs = kwargs or {}
+    if settings.TASKS_EAGER:
+        get_function(name)(*args, **kwargs)
+        return None
+    return Task.objects.create(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+        max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+    )
+
+
+def get_function(name):
+    if name not in _registry:
+        import_module(name.rsplit('.', 1)[0])
+    return _registry[name]
+
+
+def claim(worker):
+    """Атомарно берёт в работу первую готовую задачу или возвращает None."""
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, last_error='Обработчик не завершил задачу')
+    stale.update(status=Task.QUEUED, locked_by='')
+    ready = Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'id')
+    for pk in ready.values_list('pk', flat=True)[:settings.TASKS_CLAIM_BATCH]:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(item):
+    """Выполняет задачу и записывает результат или планирует повтор."""
+    try:
+        args, kwargs = item.arguments
+        get_function(item.name)(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s #%s завершилась ошибкой', item.name,
+                         item.pk)
+        updates = {'last_error': traceback.format_exc(), 'locked_by': ''}
+        if item.attempts < item.max_attempts:
+            delay = settings.TASKS_RETRY_DELAY * 2 ** (item.attempts - 1)
+            updates.update(
+                status=Task.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            updates['status'] = Task.FAILED
+        Task.objects.filter(pk=item.pk).update(**updates)
+        return False
+    if settings.TASKS_KEEP_DONE:
+        Task.objects.filter(pk=item.pk).update(
+            status=Task.DONE, locked_by='')
+    else:
+        Task.objects.filter(pk=item.pk).delete()
+    return True
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import override_settings, TestCase
+
+from .models import Task
+from .queue import claim, execute, task
+
+
+CALLS = []
+
+
+@task(max_attempts=2)
+def remember(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('Сбой задачи')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=0)
+class TaskQueueTests(TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        CALLS.clear()
+
+    def test_delay_stores_task_until_worker_runs(self):
+        """delay() ставит задачу в очередь, обработчик её выполняет"""
+        remember.delay('значение')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+        call_command('worker', once=True, concurrency=1, stdout=StringIO())
+        self.assertEqual(CALLS, ['значение'])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        """В режиме TASKS_EAGER задача выполняется сразу"""
+        remember.delay(1)
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_then_marked_failed(self):
+        """Упавшая задача повторяется, затем помечается ошибочной"""
+        explode.delay()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            execute(claim('test'))
+        item = Task.objects.get()
+        self.assertEqual(item.status, Task.QUEUED)
+        self.assertIn('Сбой задачи', item.last_error)
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            execute(claim('test'))
+        item.refresh_from_db()
+        self.assertEqual(item.status, Task.FAILED)
+        self.assertEqual(item.attempts, 2)
+        self.assertIsNone(claim('test'))
+
+    def test_password_reset_mail_sent_by_worker(self):
+        """Письмо сброса пароля уходит из фоновой задачи"""
+        get_user_model().objects.create_user(
+            username='user', email='user@example.com', password='P@ssw0rd')
+        self.client.post(
+            '/auth/password_reset/', {'email': 'user@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('worker', once=True, concurrency=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
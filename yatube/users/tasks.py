@@ -0,0 +1,11 @@
+from django.core.mail import EmailMultiAlternatives
+
+from tasks.queue import task
+
+
+@task(max_attempts=5)
+def send_mail(subject, body, from_email, to, html_message=None):
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_message is not None:
+        message.attach_alternative(html_message, 'text/html')
+    message.send()
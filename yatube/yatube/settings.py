@@ -1,3 +1,4 @@
+import hashlib
 import os
 from distutils.util import strtobool
 from pathlib import Path
@@ -34,16 +35,21 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'tasks.apps.TasksConfig',
     'sorl.thumbnail',
 
 ]
 
 MIDDLEWARE = [
+    'core.staticfiles.StaticFilesMiddleware',
+    'core.metrics.PerformanceMiddleware',
+    'core.profiler.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     #'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -55,12 +61,26 @@ INTERNAL_IPS = [
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Кэширующий загрузчик разбирает каждый шаблон один раз на процесс;
+# TEMPLATE_WARMUP разбирает все шаблоны из DIRS при запуске сервера
+TEMPLATE_CACHE = bool(strtobool(os.getenv('TEMPLATE_CACHE', str(not DEBUG))))
+TEMPLATE_WARMUP = bool(
+    strtobool(os.getenv('TEMPLATE_WARMUP', str(TEMPLATE_CACHE)))
+)
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -73,17 +93,52 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+# Потоки, в которых ASGI-приложение выполняет представления
+ASGI_THREADS: int = int(os.getenv('ASGI_THREADS', 8))
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профиль производительности SQLite: WAL, mmap и постоянные соединения
+SQLITE_TUNING = bool(strtobool(os.getenv('SQLITE_TUNING', 'False')))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+}
+SQLITE_BUSY_TIMEOUT: float = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+SQLITE_LOCKED_RETRIES: int = int(os.getenv('SQLITE_LOCKED_RETRIES', 3))
+CONN_MAX_AGE: int = int(
+    os.getenv('CONN_MAX_AGE', 600 if SQLITE_TUNING else 0)
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT},
     }
 }
 
+# Реплики только для чтения: пути к копиям базы через запятую
+DATABASE_REPLICAS = [
+    path for path in os.getenv('DATABASE_REPLICAS', '').split(',') if path
+]
+for number, path in enumerate(DATABASE_REPLICAS, 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, path),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT},
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи сессия читает только из основной базы
+REPLICA_STICKY_SECONDS: int = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -124,6 +179,38 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.getenv('STATIC_ROOT', os.path.join(BASE_DIR, 'static_root'))
+
+# Сборка статики: collectstatic сжимает пачки BUNDLES, даёт файлам имена с
+# хэшем и готовит копии .gz/.br, а StaticFilesMiddleware отдаёт их из
+# STATIC_ROOT с вечным кэшированием
+STATIC_PIPELINE = bool(strtobool(os.getenv('STATIC_PIPELINE', 'False')))
+if STATIC_PIPELINE:
+    STATICFILES_STORAGE = 'core.staticfiles.PipelineStorage'
+STATIC_MAX_AGE: int = 60 * 60
+BUNDLES = {
+    'css/site.css': ['css/styles.css'],
+    'js/site.js': ['js/scripts.js'],
+}
+# Внешние шрифты и скрипты; manage.py vendor_assets скачивает их в static/,
+# и шаблоны берут локальные копии вместо CDN
+VENDOR_ASSETS = {
+    'vendor/fonts/lora.css': (
+        'https://fonts.googleapis.com/css'
+        '?family=Lora:400,700,400italic,700italic'
+    ),
+    'vendor/fonts/open-sans.css': (
+        'https://fonts.googleapis.com/css?family=Open+Sans:300italic,'
+        '400italic,600italic,700italic,800italic,400,300,600,700,800'
+    ),
+    'vendor/fontawesome/all.js': (
+        'https://use.fontawesome.com/releases/v6.1.0/js/all.js'
+    ),
+    'vendor/bootstrap/bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/'
+        'bootstrap.bundle.min.js'
+    ),
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -132,17 +219,125 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 POSTS_COUNT: int = 10
+COMMENTS_COUNT: int = 20
 LEN_LIMIT: int = 15
 
+# Лента подписок: авторы с большим числом подписчиков читаются на лету
+TIMELINE_FANOUT_LIMIT: int = 1000
+# Чтение на лету выключается, когда подписчиков меньше этой доли предела
+TIMELINE_FANOUT_RELEASE: float = 0.9
+TIMELINE_BACKFILL: int = 1000
+TIMELINE_BATCH_SIZE: int = 500
+
+# Фоновые задачи: TASKS_EAGER выполняет их сразу, без обработчика
+TASKS_EAGER = bool(strtobool(os.getenv('TASKS_EAGER', 'False')))
+TASKS_CONCURRENCY: int = int(os.getenv('TASKS_CONCURRENCY', 2))
+TASKS_POLL_INTERVAL: float = float(os.getenv('TASKS_POLL_INTERVAL', 1))
+TASKS_MAX_ATTEMPTS: int = 3
+TASKS_RETRY_DELAY: int = 10
+TASKS_LOCK_TIMEOUT: int = 15 * 60
+TASKS_CLAIM_BATCH: int = 10
+TASKS_KEEP_DONE = False
+
+# Уменьшенные копии картинок постов
+IMAGE_VARIANT_SIZES = (
+    (320, 113), (480, 170), (640, 226), (960, 339), (1280, 452), (1920, 678)
+)
+IMAGE_FEED_WIDTH: int = 960
+# Загрузки перекодируются в мастер-копию не больше IMAGE_MASTER_SIZE по
+# большей стороне; картинки больше IMAGE_MAX_PIXELS не принимаются.
+IMAGE_MAX_UPLOAD_SIZE: int = 20 * 1024 * 1024
+IMAGE_MAX_PIXELS: int = 40 * 10 ** 6
+IMAGE_MASTER_SIZE: int = 2560
+IMAGE_MASTER_QUALITY: int = 90
+# Ширина картинки в колонке ленты на разных экранах: по ней браузер
+# выбирает копию из srcset.
+IMAGE_SIZES = (
+    '(min-width: 1400px) 690px, (min-width: 1200px) 585px, '
+    '(min-width: 992px) 552px, (min-width: 768px) 536px, '
+    '(min-width: 576px) 468px, calc(100vw - 72px)'
+)
+
+# Полнотекстовый поиск; вне SQLite - SimpleSearchBackend
+SEARCH_BACKEND = os.getenv(
+    'SEARCH_BACKEND', 'posts.search.backends.SQLiteFTSBackend'
+)
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Замеры запросов: Server-Timing, журнал core.metrics и перцентили по
+# последним PERF_SAMPLES ответам каждого URL на admin/performance/
+PERF_METRICS = bool(strtobool(os.getenv('PERF_METRICS', 'True')))
+PERF_SAMPLES: int = int(os.getenv('PERF_SAMPLES', 1000))
+PERF_LOG_LEVEL = os.getenv('PERF_LOG_LEVEL', 'WARNING')
+
+# Выборочное профилирование: доля запросов или подписанный заголовок
+# X-Profile (manage.py profile_token); стеки пишутся в PROFILE_DIR
+PROFILE_SAMPLE_RATE: float = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_INTERVAL: float = float(os.getenv('PROFILE_INTERVAL', 0.005))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_NAMESPACES = ('posts',)
+PROFILE_TOKEN_AGE: int = 60 * 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': PERF_LOG_LEVEL,
+            'propagate': False,
+        },
+        'core.profiler': {
+            'handlers': ['console'],
+            'level': PERF_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # Custom error page
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 # Cache
-CACHES = {
-    'default': {
+# Общий для всех процессов кэш в файле SQLite; CACHE_BACKEND=locmem
+# возвращает кэш в памяти каждого процесса. Тесты подменяют кэш на locmem
+# (core.testing) и не трогают файл кэша запущенного сервера.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+
+
+def database_key_prefix(database):
+    """Префикс ключей кэша для базы по её пути из настроек.
+
+    Ключи вида post:<pk> у разных баз совпадают; у процессов, запущенных
+    до и после migrate, префикс один и тот же.
+    """
+    name = os.path.abspath(database['NAME'])
+    return hashlib.md5(name.encode()).hexdigest()[:12]
+
+
+CACHE_BACKENDS = {
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'KEY_PREFIX': database_key_prefix(DATABASES['default']),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 50000)),
+            'MAX_SIZE': int(os.getenv('CACHE_MAX_SIZE', 256 * 1024 * 1024)),
+        },
+    },
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
 }
+CACHES = {'default': CACHE_BACKENDS[CACHE_BACKEND]}
+TEST_RUNNER = 'core.testing.TestRunner'
+POST_CARD_CACHE_TIME: int = 60 * 60 * 24
+PAGE_CACHE_TIME: int = 60 * 60
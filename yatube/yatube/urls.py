@@ -3,9 +3,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import performance, template_performance
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('admin/performance/', performance, name='performance'),
+    path(
+        'admin/performance/templates/', template_performance,
+        name='template_performance'
+    ),
     path('admin/', admin.site.urls),
     path("auth/", include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),